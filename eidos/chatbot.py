@@ -1,195 +1,530 @@
-import json
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import streamlit as st
-from langchain_community.chat_message_histories.streamlit import (
-    StreamlitChatMessageHistory,
-)
-from langchain_community.utilities import GoogleSearchAPIWrapper
-from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import (
-    ChatPromptTemplate,
-    MessagesPlaceholder,
-    PromptTemplate,
+from streamlit.runtime.scriptrunner import (
+    add_script_run_ctx,
+    get_script_run_ctx,
 )
-from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
 
+from eidos.completion_cache import CompletionCache
 from eidos.document_manager import DocumentManager
+from eidos.history import HistoryWindow
+from eidos.hybrid_retrieval import HybridRetrieval
+from eidos.instrumentation import StageCallbackHandler, StageMetrics
+from eidos.lazy import lazy_attribute
+from eidos.persistence import create_conversation_document
+from eidos.reranker import MMRRetriever
 from eidos.response_models import (
     BeliefAdvicesModel,
+    FusedTurnModel,
     RouteModel,
     StatementQualityModel,
     WebSearchQueriesModel,
 )
+from eidos.router import LexiconRouter
+from eidos.semantic_cache import SemanticCache
+from eidos.session_history import SessionHistory
+from eidos.timing import StageTimer, timed
+from eidos.warmup import (
+    WarmupIndex,
+    build_warmup_index,
+    get_warmup_path,
+    remove_stale_warmup_files,
+)
+from eidos.web_search import create_web_search
+
+logger = logging.getLogger(__name__)
+
+
+def ignore_progress(message):
+    pass
+
+
+def submit_with_script_context(executor, function, *args, **kwargs):
+    # Lets worker threads write into the caller's Streamlit container
+    script_context = get_script_run_ctx()
+    context = contextvars.copy_context()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), script_context)
+        return context.run(function, *args, **kwargs)
+
+    return executor.submit(run)
 
 
 class ChatbotPipeline:
-    def __init__(self, configuration):
+    def __init__(
+        self,
+        configuration,
+        document_manager=None,
+        http_client=None,
+        metrics=None,
+        web_search=None,
+    ):
         self.config = configuration
-        self.document_manager = DocumentManager(configuration)
+        self.http_client = http_client
+        if document_manager is not None:
+            self.document_manager = document_manager
+        if web_search is not None:
+            self.web_search = web_search
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.parameters["max_workers"],
+        )
+
+        self.metrics = metrics or StageMetrics(
+            max_samples=self.config.parameters["metrics_max_samples"],
+            export_path=self.config.parameters["metrics_export_path"],
+        )
+        self.semantic_caches = {}
+        self.router = None
+        self.warmup_index = None
+        self.last_used = time.monotonic()
 
-        self.initialize_llms()
         self.initialize_templates()
+        self.start_warmup()
+
+    # Clients and chains below are built on first use, so a session only
+    # pays for the stages it actually runs
+    @lazy_attribute
+    def document_manager(self):
+        return DocumentManager(self.config, http_client=self.http_client)
+
+    @lazy_attribute
+    def web_search(self):
+        return create_web_search(
+            self.config.parameters,
+            http_client=self.http_client,
+        )
 
-        self.chain_route = self.create_chain_route()
-        self.chain_expansion = self.create_chain_expansion()
-        self.chain_context = self.create_chain_context()
-        self.chain_quality = self.create_chain_quality()
-        self.chain_summary = self.create_chain_summary()
-
-        # fmt: off
-        self.chain_belief_advices = (
-            self.create_chain_with_structured_llm(
-                "belief_advices",
-                BeliefAdvicesModel,
-            )
+    @lazy_attribute
+    def completion_cache(self):
+        return self.create_completion_cache()
+
+    @lazy_attribute
+    def hybrid_retrieval(self):
+        return self.create_hybrid_retrieval()
+
+    @lazy_attribute
+    def history_window(self):
+        return self.create_history_window()
+
+    @lazy_attribute
+    def llm_main(self):
+        return self.create_llm("main")
+
+    @lazy_attribute
+    def llm_helper(self):
+        return self.create_llm("helper")
+
+    @lazy_attribute
+    def chain_route(self):
+        return self.create_chain_route()
+
+    @lazy_attribute
+    def chain_expansion(self):
+        return self.create_chain_expansion()
+
+    @lazy_attribute
+    def chain_context(self):
+        return self.create_chain_context(self.document_manager.retriever)
+
+    @lazy_attribute
+    def chain_warm_context(self):
+        return self.create_chain_warm_context()
+
+    @lazy_attribute
+    def chain_quality(self):
+        return self.create_chain_quality()
+
+    @lazy_attribute
+    def chain_summary(self):
+        return self.create_chain_summary()
+
+    @lazy_attribute
+    def chain_belief_advices(self):
+        return self.create_chain_with_structured_llm(
+            "belief_advices",
+            BeliefAdvicesModel,
         )
-        self.chain_web_queries = (
-            self.create_chain_with_structured_llm(
-                "web_search_queries",
-                WebSearchQueriesModel,
-            )
+
+    @lazy_attribute
+    def chain_web_queries(self):
+        return self.create_chain_with_structured_llm(
+            "web_search_queries",
+            WebSearchQueriesModel,
         )
-        # fmt: on
 
-        self.chain_question = self.create_chain_with_history("question")
-        self.chain_answer = self.create_chain_with_history("answer")
+    @lazy_attribute
+    def chain_question(self):
+        return self.create_chain_with_history("question")
 
-    def initialize_llms(self):
-        self.llm_main = ChatOpenAI(
-            model=self.config.parameters["llm_main"],
-            temperature=self.config.parameters["llm_temperature"],
+    @lazy_attribute
+    def chain_answer(self):
+        return self.create_chain_with_history("answer")
+
+    @lazy_attribute
+    def chain_fused(self):
+        return self.create_chain_fused()
+
+    def create_completion_cache(self):
+        max_entries = self.config.parameters["completion_cache_max_entries"]
+        if not max_entries:
+            return None
+
+        return CompletionCache(
+            ttl=self.config.parameters["completion_cache_ttl"],
+            max_entries=max_entries,
         )
-        self.llm_helper = ChatOpenAI(
-            model=self.config.parameters["llm_helper"],
+
+    def create_llm(self, role):
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=self.config.parameters[f"llm_{role}"],
             temperature=self.config.parameters["llm_temperature"],
+            http_client=self.http_client,
+            cache=self.completion_cache,
         )
 
-    def initialize_templates(self):
-        instructions = [
-            self.config.selected_topic["instruction"].strip(),
-            self.config.selected_language_style["instruction"].strip(),
-        ]
+    def get_greeting(self):
+        return self.prompts["greeting"]
 
-        template = self.config.templates["system"]
-        template = template.format(instructions=" ".join(instructions))
-        self.system_template = template.strip()
+    def initialize_templates(self):
+        # Prompts are compiled once per topic and language style
+        self.prompts = self.config.get_prompts()
+        self.system_template = self.prompts["system"]
 
     def create_chain_route(self):
-        template = self.config.templates["route"]
-        prompt_template = PromptTemplate.from_template(template)
         llm = self.llm_helper.with_structured_output(RouteModel)
-        chain = prompt_template | llm
-        return chain.with_config({"run_name": "Dialogue Route"})
+        llm_chain = self.prompts["route"] | llm
+        chain = self.add_semantic_cache("route", llm_chain)
+        if self.config.parameters["local_router"]:
+            self.router = LexiconRouter(
+                self.config.router_lexicon["philosophers"],
+                self.config.router_lexicon["keywords"],
+                self.config.parameters["router_vectorstore_threshold"],
+                self.config.parameters["router_llm_threshold"],
+                self.config.parameters["router_shadow_rate"],
+                self.executor,
+                log_path=self.config.parameters["router_log_path"],
+            )
+            chain = self.router.wrap(chain, shadow_chain=llm_chain)
+        return chain.with_config(
+            self.get_chain_config("Dialogue Route", "route")
+        )
 
     def create_chain_expansion(self):
-        template = self.config.templates["expansion"]
-        prompt_template = PromptTemplate.from_template(template)
-        chain = prompt_template | self.llm_helper | StrOutputParser()
-        return chain.with_config({"run_name": "Text Expansion"})
+        chain = self.prompts["expansion"] | self.llm_helper | StrOutputParser()
+        chain = self.add_semantic_cache("expansion", chain)
+        return chain.with_config(
+            self.get_chain_config("Text Expansion", "expansion")
+        )
 
-    def create_chain_context(self):
-        chain = (
-            self.chain_expansion
-            | self.document_manager.retriever
-            | self.format_documents
+    def get_chain_config(self, run_name, stage):
+        handler = StageCallbackHandler(self.metrics, stage)
+        return {"run_name": run_name, "callbacks": [handler]}
+
+    def add_semantic_cache(self, name, chain):
+        threshold = self.config.parameters["semantic_cache_threshold"]
+        if not threshold:
+            return chain
+
+        cache = SemanticCache(
+            self.document_manager.embedding_model,
+            threshold=threshold,
+            ttl=self.config.parameters["semantic_cache_ttl"],
+            max_entries=self.config.parameters["semantic_cache_max_entries"],
+            on_hit=lambda: self.metrics.record_cache_hit(name),
+        )
+        self.semantic_caches[name] = cache
+        return cache.wrap(chain)
+
+    def format_cache_stats(self):
+        stats = []
+        for name, cache in self.semantic_caches.items():
+            cache_stats = cache.get_stats()
+            stats.append(
+                f"{name} {cache_stats['hits']}/"
+                f"{cache_stats['hits'] + cache_stats['misses']}"
+                f" ({cache_stats['hit_rate']:.0%})"
+            )
+        return f"Semantic cache hits: {', '.join(stats)}."
+
+    def format_completion_cache_stats(self):
+        stats = self.completion_cache.get_stats()
+        return (
+            f"Completion cache hits: {stats['hits']}/"
+            f"{stats['hits'] + stats['misses']} ({stats['hit_rate']:.0%})."
         )
+
+    def format_router_stats(self):
+        stats = self.router.get_stats()
+        return (
+            f"Local router decided {stats['local_rate']:.0%} of routes,"
+            f" agreeing with the LLM on {stats['shadow_agreement']:.0%} of"
+            f" {stats['shadow_compared']} shadow checks."
+        )
+
+    def create_hybrid_retrieval(self):
+        lexical_index = self.document_manager.lexical_index
+        if not lexical_index:
+            return None
+
+        return HybridRetrieval(
+            lexical_index,
+            k=self.config.parameters["docs_to_use"],
+            fetch_k=self.config.parameters["lexical_fetch_k"],
+            fast_path_threshold=self.config.parameters[
+                "lexical_fast_path_threshold"
+            ],
+        )
+
+    def create_chain_context(self, retriever):
+        retriever = retriever.with_config(
+            self.get_chain_config("Document Search", "retrieval")
+        )
+        if self.hybrid_retrieval:
+            chain = self.hybrid_retrieval.wrap(self.chain_expansion, retriever)
+        else:
+            chain = self.chain_expansion | retriever
+        chain = chain | self.format_documents
         return chain.with_config({"run_name": "Document Retrieval"})
 
-    def create_chain_quality(self):
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                ("system", f"{self.system_template}\n\n{{context}}"),
-                MessagesPlaceholder(variable_name="history"),
-                ("human", self.config.templates["quality"]),
-            ]
+    def create_chain_warm_context(self):
+        if not self.config.parameters["warmup_path"]:
+            return None
+        if self.config.parameters["search_type"] != "mmr":
+            return None
+
+        # First turns re-rank the prefetched topic candidates locally
+        retriever = MMRRetriever(
+            embedding=self.document_manager.embedding_model,
+            search_candidates=self.search_warm_candidates,
+            k=self.config.parameters["docs_to_use"],
+            fetch_k=self.config.parameters["docs_to_process"],
+            lambda_mult=self.config.parameters["mmr_lambda"],
         )
+        return self.create_chain_context(retriever)
+
+    def search_warm_candidates(self, embedding, fetch_k):
+        return self.warmup_index.search_candidates(embedding, fetch_k)
+
+    def start_warmup(self):
+        seed_statements = self.config.selected_topic.get("seed_statements")
+        if not self.config.parameters["warmup_path"] or not seed_statements:
+            return
+        if self.config.parameters["search_type"] != "mmr":
+            return
+
+        path = get_warmup_path(
+            self.config.parameters,
+            self.config.selected_topic,
+        )
+        if os.path.exists(path):
+            self.warmup_index = WarmupIndex.load(path)
+        elif self.config.parameters["warmup_on_start"]:
+            future = self.executor.submit(
+                self.build_warmup,
+                path,
+                seed_statements,
+            )
+            future.add_done_callback(self.log_warmup_error)
+
+    def build_warmup(self, path, seed_statements):
+        warmup_index = build_warmup_index(
+            self.document_manager,
+            seed_statements,
+            self.config.parameters["warmup_candidates"],
+        )
+        warmup_index.save(path)
+        remove_stale_warmup_files(
+            self.config.parameters,
+            self.config.selected_topic,
+            path,
+        )
+        self.warmup_index = warmup_index
+
+    def log_warmup_error(self, future):
+        # Without a warm index first turns use the regular retrieval, so a
+        # failed build is only logged
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(
+                "Building the warmup index failed",
+                exc_info=(type(error), error, error.__traceback__),
+            )
+
+    def get_chain_context(self, first_turn):
+        if first_turn and self.warmup_index:
+            return self.chain_warm_context
+        return self.chain_context
+
+    def format_hybrid_stats(self):
+        stats = self.hybrid_retrieval.get_stats()
+        return (
+            f"Lexical fast path served {stats['fast_path_rate']:.0%} of"
+            f" {stats['fast_path'] + stats['fused']} retrievals."
+        )
+
+    def create_chain_quality(self):
         chain = (
-            prompt_template
+            self.prompts["quality"]
             | self.llm_main.with_structured_output(StatementQualityModel)
             | self.format_quality
         )
-        return chain.with_config({"run_name": "Statement Quality"})
+        return chain.with_config(
+            self.get_chain_config("Statement Quality", "quality")
+        )
+
+    def create_chain_fused(self):
+        chain = self.prompts["fused"] | self.llm_main.with_structured_output(
+            FusedTurnModel
+        )
+        return chain.with_config(
+            self.get_chain_config("Fused Turn Generation", "fused")
+        )
 
     def create_chain_summary(self):
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                MessagesPlaceholder(variable_name="history"),
-                ("human", self.config.templates["summary"]),
-            ]
+        chain = self.prompts["summary"] | self.llm_main | StrOutputParser()
+        return chain.with_config(
+            self.get_chain_config("Dialogue Summary", "summary")
         )
-        chain = prompt_template | self.llm_main | StrOutputParser()
-        return chain.with_config({"run_name": "Dialogue Summary"})
 
-    def create_chain_with_history(self, template_key):
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                ("system", self.system_template),
-                MessagesPlaceholder(variable_name="history"),
-                ("human", self.config.templates[template_key]),
-            ]
+    def create_history_window(self):
+        token_budget = self.config.parameters["history_token_budget"]
+        if not token_budget:
+            return None
+
+        return HistoryWindow(
+            lambda messages: self.chain_summary.invoke({"history": messages}),
+            model=self.config.parameters["llm_main"],
+            token_budget=token_budget,
+            keep_ratio=self.config.parameters["history_keep_ratio"],
+            max_cached=self.config.parameters["history_max_summaries"],
         )
-        chain = prompt_template | self.llm_main | StrOutputParser()
+
+    def create_chain_with_history(self, template_key):
+        chain = self.prompts[template_key] | self.llm_main | StrOutputParser()
         return chain.with_config(
-            {
-                "run_name": f"{template_key.capitalize()} Generation",
-            }
+            self.get_chain_config(
+                f"{template_key.capitalize()} Generation",
+                template_key,
+            )
         )
 
     def create_chain_with_structured_llm(self, template_key, model):
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                MessagesPlaceholder(variable_name="history"),
-                ("human", self.config.templates[template_key]),
-            ]
-        )
         llm = self.llm_main.with_structured_output(model)
-        chain = prompt_template | llm
+        chain = self.prompts[template_key] | llm
         run_name = f"{template_key.replace('_', ' ').title()} Generation"
-        return chain.with_config({"run_name": run_name})
+        return chain.with_config(self.get_chain_config(run_name, template_key))
 
     def format_documents(self, docs):
         context = "\n\n".join([f"'''\n{doc.page_content}\n'''" for doc in docs])
         return f"{self.config.templates['context']}\n\n{context}"
 
+    def format_context(self, context):
+        # Retrieved texts lead the final message instead of the system prompt
+        return f"{context}\n\n" if context else ""
+
     def format_quality(self, quality):
         return (
             f"The statement is logically {quality.classification}."
             f" {quality.explanation}"
         )
 
-    def get_messages_from_history(self, history):
-        messages = []
-        for message in history.messages:
-            content = json.loads(message.content)
-            if message.type == "human":
-                messages.append(HumanMessage(content["message"]))
-            else:
-                messages.append(AIMessage(content["message"]))
-        return messages
-
-    def get_response(self, user_message, history):
-        messages = self.get_messages_from_history(history)
+    def touch(self):
+        # Shared pipelines are evicted after pipeline_idle_ttl without a turn
+        self.last_used = time.monotonic()
 
-        st.write("🔗 Choosing best dialogue path...")
-        route = self.chain_route.invoke({"user_message": user_message})
-        if route.decision == "vectorstore":
-            st.write("📚 Reading philosophical texts...")
-            context = self.chain_context.invoke({"user_message": user_message})
-        else:
-            context = None
+    def get_messages_from_history(self, history):
+        return history.get_langchain_messages()
+
+    def fit_history(self, messages):
+        if not self.history_window:
+            return messages
+        return self.history_window.fit(messages)
+
+    def get_context(self, user_message, chain_context, timer, progress):
+        inputs = {"user_message": user_message}
+        route = timer.run("route", self.chain_route.invoke, inputs)
+        if route.decision != "vectorstore":
+            return None
+
+        progress("📚 Reading philosophical texts...")
+        return timer.run("retrieval", chain_context.invoke, inputs)
+
+    def is_route_pending(self, user_message):
+        # Building the route chain also creates the local router
+        self.chain_route
+        if not self.router:
+            return True
+        return self.router.decide(self.router.score(user_message)) is None
+
+    def get_context_speculatively(
+        self,
+        user_message,
+        chain_context,
+        timer,
+        progress,
+    ):
+        # A running retrieval cannot be cancelled, so it only starts early
+        # while the slow LLM route is pending
+        if not self.is_route_pending(user_message):
+            return self.get_context(
+                user_message,
+                chain_context,
+                timer,
+                progress,
+            )
 
-        st.write("🔍 Checking for inconsistency...")
-        quality = self.chain_quality.invoke(
+        # Retrieval starts alongside routing and is discarded on an LLM route
+        inputs = {"user_message": user_message}
+        future = self.executor.submit(
+            contextvars.copy_context().run,
+            timed,
+            chain_context.invoke,
+            inputs,
+        )
+        route = timer.run("route", self.chain_route.invoke, inputs)
+        if route.decision != "vectorstore":
+            future.cancel()
+            return None
+
+        progress("📚 Reading philosophical texts...")
+        context, duration = future.result()
+        timer.record("retrieval", duration)
+        return context
+
+    def get_staged_answer(
+        self,
+        user_message,
+        messages,
+        context,
+        timer,
+        stream,
+        progress,
+    ):
+        progress("🔍 Checking for inconsistency...")
+        quality = timer.run(
+            "quality",
+            self.chain_quality.invoke,
             {
                 "user_message": user_message,
                 "history": messages,
-                "context": context,
-            }
+                "context": self.format_context(context),
+            },
         )
 
-        st.write("❓ Generating best question to ask...")
+        progress("❓ Generating best question to ask...")
         if "inconsistent" in quality:
             question_instruction = self.config.templates[
                 "question_instruction_inconsistent"
@@ -199,37 +534,154 @@ class ChatbotPipeline:
                 "question_instruction_consistent"
             ]
 
-        question = self.chain_question.invoke(
+        question = timer.run(
+            "question",
+            self.chain_question.invoke,
             {
                 "user_message": user_message,
                 "history": messages,
                 "statement_quality": quality,
                 "question_instruction": question_instruction,
-            }
+            },
         )
 
-        st.write("📝 Gathering my thoughts...")
-        answer = self.chain_answer.invoke(
+        progress("📝 Gathering my thoughts...")
+        answer_inputs = {
+            "user_message": user_message,
+            "history": messages,
+            "statement_quality": quality,
+            "question": question,
+        }
+        if stream:
+            # Tokens are pulled by the caller as the completion arrives
+            answer = self.chain_answer.stream(answer_inputs)
+        else:
+            answer = timer.run(
+                "answer",
+                self.chain_answer.invoke,
+                answer_inputs,
+            )
+
+        return quality, answer
+
+    def get_fused_answer(
+        self,
+        user_message,
+        messages,
+        context,
+        timer,
+        stream,
+        progress,
+    ):
+        # Quality, question and answer come from a single structured call
+        progress("🔍 Checking for inconsistency and writing a reply...")
+        turn = timer.run(
+            "fused",
+            self.chain_fused.invoke,
             {
                 "user_message": user_message,
                 "history": messages,
-                "statement_quality": quality,
-                "question": question,
-            }
+                "context": self.format_context(context),
+            },
         )
+        quality = self.format_quality(turn)
+        if stream:
+            return quality, iter([turn.answer])
+        return quality, turn.answer
+
+    def get_response(
+        self,
+        user_message,
+        history,
+        stream=False,
+        progress=ignore_progress,
+    ):
+        self.touch()
+        messages = self.get_messages_from_history(history)
+        chain_context = self.get_chain_context(first_turn=len(messages) <= 1)
+        parallel = self.config.parameters["parallel_stages"]
+        timer = StageTimer()
+
+        if parallel:
+            # Folding old turns into a summary overlaps with routing
+            history_future = self.executor.submit(
+                contextvars.copy_context().run,
+                timed,
+                self.fit_history,
+                messages,
+            )
+
+        progress("🔗 Choosing best dialogue path...")
+        if parallel:
+            context = self.get_context_speculatively(
+                user_message,
+                chain_context,
+                timer,
+                progress,
+            )
+        else:
+            context = self.get_context(
+                user_message,
+                chain_context,
+                timer,
+                progress,
+            )
+
+        if parallel:
+            messages, duration = history_future.result()
+            timer.record("history", duration)
+        else:
+            messages = timer.run("history", self.fit_history, messages)
+
+        if self.config.parameters["fused_turn"]:
+            _, answer = self.get_fused_answer(
+                user_message,
+                messages,
+                context,
+                timer,
+                stream,
+                progress,
+            )
+        else:
+            _, answer = self.get_staged_answer(
+                user_message,
+                messages,
+                context,
+                timer,
+                stream,
+                progress,
+            )
+
+        if parallel:
+            progress(f"⏱️ {timer.format_report()}")
+        if self.semantic_caches:
+            progress(f"♻️ {self.format_cache_stats()}")
+        if self.completion_cache:
+            progress(f"♻️ {self.format_completion_cache_stats()}")
+        if self.router:
+            progress(f"🧭 {self.format_router_stats()}")
+        if self.hybrid_retrieval:
+            progress(f"🔎 {self.format_hybrid_stats()}")
 
         if context:
             context = context.split("\n\n", 1)[1]  # Remove the template
 
         return {"message": answer, "context": context}
 
-    def get_summary(self, history):
-        st.write("📄 Summarizing our conversation...")
+    def get_summary(self, history, progress=ignore_progress):
+        self.touch()
+        progress("📄 Summarizing our conversation...")
         messages = self.get_messages_from_history(history)
         return self.chain_summary.invoke({"history": messages})
 
-    def get_belief_advices(self, history, max_results=3):
-        st.write("🧠 Exploring your beliefs further...")
+    def get_belief_advices(
+        self,
+        history,
+        max_results=3,
+        progress=ignore_progress,
+    ):
+        self.touch()
+        progress("🧠 Exploring your beliefs further...")
         messages = self.get_messages_from_history(history)
         response = self.chain_belief_advices.invoke({"history": messages})
         return response.advices[:max_results]
@@ -243,66 +695,64 @@ class ChatbotPipeline:
             title = title.replace(removable, "")
         return title.strip()
 
-    def get_suggested_readings(self, history, max_results=5):
-        st.write("🌐 Initializing web search tool...")
-        search = GoogleSearchAPIWrapper()
-        tool = Tool(
-            name="Google Search Snippets",
-            description="Search Google for recent results.",
-            func=lambda query: search.results(query, 2),
-        )
-
-        st.write("❓ Generating relevant search queries...")
+    def get_suggested_readings(
+        self,
+        history,
+        max_results=5,
+        progress=ignore_progress,
+    ):
+        self.touch()
+        progress("❓ Generating relevant search queries...")
         messages = self.get_messages_from_history(history)
         response = self.chain_web_queries.invoke({"history": messages})
 
-        st.write("🔍 Searching for online articles...")
-        readings = []
-        for query in response.queries:
-            results = tool.run(query)
-            for result in results:
-                if not any(result["title"] == r["title"] for r in readings):
-                    result["title"] = self.format_reading_title(result["title"])
-                    readings.append(result)
-
+        progress("🔍 Searching for online articles...")
+        query_results = self.web_search.search_many(response.queries)
+        readings = self.web_search.dedupe(
+            (result for results in query_results for result in results),
+            format_title=self.format_reading_title,
+        )
         return readings[:max_results]
 
 
 class ChatbotAgent:
-    def __init__(self, configuration):
+    def __init__(self, configuration, pipeline=None, conversation_writer=None):
         self.config = configuration
-        self.pipeline = ChatbotPipeline(configuration)
-        self.chat_history = StreamlitChatMessageHistory()
+        self.pipeline = pipeline or ChatbotPipeline(configuration)
+        self.conversation_writer = conversation_writer
+        self.conversation_id = uuid.uuid4().hex
+        self.chat_history = SessionHistory()
         self.chat_count = 0
 
         self.add_initial_message()
 
     def add_initial_message(self):
-        if self.chat_history.messages:
+        if self.chat_history:
             return
 
-        greeting = self.config.templates["greeting"]
-        topic = self.config.selected_topic["title"]
-        greeting = greeting.format(topic=topic)
+        self.chat_history.add_ai_message(self.pipeline.get_greeting())
+
+    def display_summary(self, summary):
+        st.markdown("### 📄 Dialogue Summary")
+        st.markdown(summary)
 
-        content = json.dumps({"message": greeting})
-        self.chat_history.add_ai_message(content)
+    def display_advices(self, advices):
+        st.markdown("### 🧠 Ways to Explore Beliefs Further")
+        for advice in advices:
+            with st.container(border=True):
+                st.markdown(advice)
+
+    def display_readings(self, readings):
+        st.markdown("### 📚 Interesting Online Articles")
+        readings = [f"- [{r['title']}]({r['link']})" for r in readings]
+        st.markdown("\n".join(readings))
 
     def display_final_response(self, container):
-        with container.status(
+        status = container.status(
             "🔚 Wrapping up the conversation...",
             expanded=True,
-        ) as status:
-            summary = self.pipeline.get_summary(self.chat_history)
-            advices = self.pipeline.get_belief_advices(self.chat_history)
-            readings = self.pipeline.get_suggested_readings(self.chat_history)
-            status.update(
-                label="Conversation ended.",
-                state="complete",
-                expanded=False,
-            )
-
-        tab1, tab2, tab3 = container.tabs(
+        )
+        tabs = container.tabs(
             [
                 "📄 Summary",
                 "🧠 Suggestions",
@@ -310,38 +760,71 @@ class ChatbotAgent:
             ]
         )
 
-        with tab1:
-            st.markdown("### 📄 Dialogue Summary")
-            st.markdown(summary)
+        sections = [
+            (self.pipeline.get_summary, self.display_summary),
+            (self.pipeline.get_belief_advices, self.display_advices),
+            (self.pipeline.get_suggested_readings, self.display_readings),
+        ]
 
-        with tab2:
-            st.markdown("### 🧠 Ways to Explore Beliefs Further")
-            for advice in advices:
-                with st.container(border=True):
-                    st.markdown(advice)
+        with status:
+            jobs = {}
+            for tab, (get_result, display_result) in zip(tabs, sections):
+                placeholder = tab.empty()
+                placeholder.caption("⏳ Still working on this part...")
+                future = submit_with_script_context(
+                    self.pipeline.executor,
+                    get_result,
+                    self.chat_history,
+                    progress=st.write,
+                )
+                jobs[future] = (placeholder, display_result)
 
-        with tab3:
-            st.markdown("### 📚 Interesting Online Articles")
-            readings = [f"- [{r['title']}]({r['link']})" for r in readings]
-            st.markdown("\n".join(readings))
+            for future in as_completed(jobs):
+                placeholder, display_result = jobs[future]
+                with placeholder.container():
+                    display_result(future.result())
+
+            status.update(
+                label="Conversation ended.",
+                state="complete",
+                expanded=False,
+            )
+
+    def display_context(self, chat, text):
+        with chat.expander("These texts helped me think better:"):
+            contexts = [
+                f"> {cleaned_context}"
+                for context in text.split("\n")
+                if (cleaned_context := context.strip("'"))
+            ]
+            st.markdown("\n\n".join(contexts))
+
+    def display_stage_timings(self, chat, turn):
+        rows = [
+            {
+                "stage": stage,
+                "seconds": round(values["seconds"], 2),
+                "prompt tokens": values["prompt_tokens"],
+                "completion tokens": values["completion_tokens"],
+                "cache hits": values["cache_hits"],
+            }
+            for stage, values in turn.items()
+        ]
+        with chat.expander("⏱️ Stage timings"):
+            st.table(rows)
 
     def display_messages(self):
-        for message in self.chat_history.messages:
-            chat = st.chat_message(message.type)
-            content = json.loads(message.content)
-
-            chat.write(content["message"])
-
-            if message.type == "ai" and content.get("context"):
-                with chat.expander("These texts helped me think better:"):
-                    contexts = [
-                        f"> {cleaned_context}"
-                        for context in content["context"].split("\n")
-                        if (cleaned_context := context.strip("'"))
-                    ]
-                    st.markdown("\n\n".join(contexts))
-
-        if self.chat_count >= self.config.parameters["max_k_chat"]:
+        for record in self.chat_history.records:
+            chat = st.chat_message(record.type)
+            chat.write(record.message)
+
+            if record.context:
+                self.display_context(chat, record.context)
+
+            if record.stage_timings:
+                self.display_stage_timings(chat, record.stage_timings)
+
+        if self.is_finished():
             chat_container = st.chat_message("ai")
             self.display_final_response(chat_container)
             chat_container.warning("Conversation ended.", icon="⚠️")
@@ -351,25 +834,64 @@ class ChatbotAgent:
         user_input = st.chat_input(max_chars=max_chars)
 
         if user_input:
+            stream = self.config.parameters["stream_answer"]
             st.chat_message("human").write(user_input)
 
-            with st.chat_message("ai").status(
-                "💭 Generating a meaningful response...",
-                expanded=True,
-            ):
-                response = self.pipeline.get_response(
-                    user_input,
-                    self.chat_history,
-                )
+            chat = st.chat_message("ai")
+            with self.pipeline.metrics.track_turn() as turn:
+                with chat.status(
+                    "💭 Generating a meaningful response...",
+                    expanded=True,
+                ):
+                    response = self.pipeline.get_response(
+                        user_input,
+                        self.chat_history,
+                        stream=stream,
+                        progress=st.write,
+                    )
+
+                if stream:
+                    response["message"] = chat.write_stream(
+                        response["message"]
+                    )
+                    if response["context"]:
+                        self.display_context(chat, response["context"])
+
+            self.pipeline.metrics.export()
+
+            stage_timings = None
+            if self.config.parameters["show_stage_timings"]:
+                stage_timings = dict(turn)
+                if stream:
+                    self.display_stage_timings(chat, stage_timings)
+
+            self.chat_history.add_user_message(user_input)
+            self.chat_history.add_ai_message(
+                response["message"],
+                context=response["context"],
+                stage_timings=stage_timings,
+            )
+
+            self.chat_count += 1
+            self.save_conversation()
 
-            user_message = json.dumps({"message": user_input})
-            self.chat_history.add_user_message(user_message)
+            # A streamed reply is already on screen, so only the wrap-up
+            # screen needs a fresh script run
+            if not stream or self.is_finished():
+                st.rerun()
 
-            ai_message = json.dumps(response)
-            self.chat_history.add_ai_message(ai_message)
+    def save_conversation(self):
+        # Only queues the conversation, the writer thread stores it later
+        if self.conversation_writer is None:
+            return
 
-            self.chat_count += 1
-            st.rerun()
+        self.conversation_writer.save(
+            self.conversation_id,
+            create_conversation_document(self.config, self.chat_history),
+        )
+
+    def is_finished(self):
+        return self.chat_count >= self.config.parameters["max_k_chat"]
 
     def run(self):
         self.display_messages()
@@ -0,0 +1,57 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.caches import BaseCache
+
+
+def make_key(prompt, llm_string):
+    content = f"{llm_string}\0{prompt}".encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class CompletionCache(BaseCache):
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt, llm_string):
+        key = make_key(prompt, llm_string)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.time() - self.ttl:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def update(self, prompt, llm_string, return_val):
+        key = make_key(prompt, llm_string)
+        with self.lock:
+            self.entries[key] = (time.time(), return_val)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self, **kwargs):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self.entries),
+            }
@@ -0,0 +1,330 @@
+import copy
+import os
+import pickle
+import threading
+
+import langchain_core
+import pydantic
+import yaml
+from langchain_core.prompts import (
+    ChatPromptTemplate,
+    MessagesPlaceholder,
+    PromptTemplate,
+)
+
+# Bump whenever the compiled layout changes so old snapshots are rebuilt
+SNAPSHOT_VERSION = 1
+
+STRING = {"type": "string"}
+INTEGER = {"type": "integer"}
+NUMBER = {"type": "number"}
+BOOLEAN = {"type": "boolean"}
+
+
+def nullable(schema):
+    return {"anyOf": [schema, {"type": "null"}]}
+
+
+def strings(min_items=0):
+    return {"type": "array", "items": STRING, "minItems": min_items}
+
+
+PARAMETER_SCHEMAS = {
+    "llm_main": STRING,
+    "llm_helper": STRING,
+    "llm_temperature": NUMBER,
+    "embedding_model": STRING,
+    "embedding_dimensions": INTEGER,
+    "embedding_chunk_size": INTEGER,
+    "embedding_chunk_overlap": INTEGER,
+    "embedding_cache_path": nullable(STRING),
+    "embedding_cache_max_entries": INTEGER,
+    "allowed_file_types": strings(min_items=1),
+    "vectorstore_backend": {"enum": ["pinecone", "local"]},
+    "local_index_path": STRING,
+    "local_index_search": {"enum": ["exact", "ivf"]},
+    "local_index_lists": INTEGER,
+    "local_index_probes": INTEGER,
+    "ingestion_manifest_path": STRING,
+    "ingestion_batch_size": INTEGER,
+    "ingestion_workers": INTEGER,
+    "search_type": STRING,
+    "docs_to_use": INTEGER,
+    "docs_to_process": INTEGER,
+    "mmr_lambda": NUMBER,
+    "lexical_index_path": nullable(STRING),
+    "lexical_fetch_k": INTEGER,
+    "lexical_fast_path_threshold": nullable(NUMBER),
+    "max_k_chat": INTEGER,
+    "history_token_budget": nullable(INTEGER),
+    "history_keep_ratio": NUMBER,
+    "history_max_summaries": INTEGER,
+    "warmup_path": nullable(STRING),
+    "warmup_on_start": BOOLEAN,
+    "warmup_candidates": INTEGER,
+    "parallel_stages": BOOLEAN,
+    "max_workers": INTEGER,
+    "stream_answer": BOOLEAN,
+    "fused_turn": BOOLEAN,
+    "semantic_cache_threshold": nullable(NUMBER),
+    "semantic_cache_ttl": NUMBER,
+    "semantic_cache_max_entries": INTEGER,
+    "completion_cache_ttl": NUMBER,
+    "completion_cache_max_entries": nullable(INTEGER),
+    "local_router": BOOLEAN,
+    "router_vectorstore_threshold": NUMBER,
+    "router_llm_threshold": NUMBER,
+    "router_shadow_rate": NUMBER,
+    "router_log_path": nullable(STRING),
+    "metrics_export_path": nullable(STRING),
+    "metrics_max_samples": INTEGER,
+    "show_stage_timings": BOOLEAN,
+    "web_search_backend": {"enum": ["google", "fake"]},
+    "web_search_cache_path": nullable(STRING),
+    "web_search_cache_ttl": NUMBER,
+    "web_search_rate": NUMBER,
+    "web_search_burst": NUMBER,
+    "web_search_workers": INTEGER,
+    "web_search_results_per_query": INTEGER,
+    "persistence_backend": {
+        "enum": ["firestore", "firestore_emulator", "sqlite", None]
+    },
+    "persistence_collection": STRING,
+    "persistence_sqlite_path": STRING,
+    "persistence_emulator_host": STRING,
+    "persistence_emulator_project": STRING,
+    "persistence_batch_size": INTEGER,
+    "persistence_flush_interval": NUMBER,
+    "persistence_max_retries": INTEGER,
+    "persistence_retry_backoff": NUMBER,
+    "persistence_max_pending": INTEGER,
+    "session_ttl": NUMBER,
+    "pipeline_idle_ttl": NUMBER,
+    "http_max_connections": INTEGER,
+    "server_workers": INTEGER,
+}
+
+TEMPLATE_NAMES = [
+    "greeting",
+    "system",
+    "route",
+    "context",
+    "expansion",
+    "quality",
+    "question",
+    "question_instruction_consistent",
+    "question_instruction_inconsistent",
+    "answer",
+    "fused",
+    "summary",
+    "web_search_queries",
+    "belief_advices",
+]
+
+
+def option_schema(extra_properties=None):
+    return {
+        "type": "object",
+        "required": ["title", "caption", "instruction"],
+        "properties": {
+            "title": STRING,
+            "caption": STRING,
+            "instruction": STRING,
+            **(extra_properties or {}),
+        },
+    }
+
+
+CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "parameters",
+        "router_lexicon",
+        "templates",
+        "topics",
+        "language_styles",
+    ],
+    "properties": {
+        "parameters": {
+            "type": "object",
+            "required": list(PARAMETER_SCHEMAS),
+            "properties": PARAMETER_SCHEMAS,
+        },
+        "router_lexicon": {
+            "type": "object",
+            "required": ["philosophers", "keywords"],
+            "properties": {
+                "philosophers": strings(),
+                "keywords": strings(),
+            },
+        },
+        "templates": {
+            "type": "object",
+            "required": TEMPLATE_NAMES,
+            "additionalProperties": STRING,
+        },
+        "topics": {
+            "type": "array",
+            "minItems": 1,
+            "items": option_schema({"seed_statements": strings()}),
+        },
+        "language_styles": {
+            "type": "array",
+            "minItems": 1,
+            "items": option_schema(),
+        },
+    },
+}
+
+
+class ConfigurationError(ValueError):
+    pass
+
+
+def validate_config(config):
+    # Only needed when the snapshot is rebuilt, so it is imported here
+    import jsonschema
+
+    try:
+        jsonschema.validate(config, CONFIG_SCHEMA)
+    except jsonschema.ValidationError as error:
+        location = "/".join(str(part) for part in error.absolute_path)
+        raise ConfigurationError(f"{location or 'config'}: {error.message}")
+
+
+def create_chat_prompt_template(system_template, template):
+    # The system prompt and history form a prefix shared by every call
+    # over the same conversation, so only the final message differs
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", system_template),
+            MessagesPlaceholder(variable_name="history"),
+            ("human", template),
+        ]
+    )
+
+
+def compile_prompts(templates, topic, language_style):
+    instructions = [
+        topic["instruction"].strip(),
+        language_style["instruction"].strip(),
+    ]
+    system_template = templates["system"].format(
+        instructions=" ".join(instructions)
+    )
+    system_template = system_template.strip()
+
+    def chat_prompt(template):
+        return create_chat_prompt_template(system_template, template)
+
+    prompts = {
+        "system": system_template,
+        "greeting": templates["greeting"].format(topic=topic["title"]),
+        "route": PromptTemplate.from_template(templates["route"]),
+        "expansion": PromptTemplate.from_template(templates["expansion"]),
+        # Retrieved context leads the final message of these prompts
+        "quality": chat_prompt(f"{{context}}{templates['quality']}"),
+        "fused": chat_prompt(f"{{context}}{templates['fused']}").partial(
+            question_instruction_consistent=templates[
+                "question_instruction_consistent"
+            ],
+            question_instruction_inconsistent=templates[
+                "question_instruction_inconsistent"
+            ],
+        ),
+    }
+    for name in (
+        "summary",
+        "question",
+        "answer",
+        "belief_advices",
+        "web_search_queries",
+    ):
+        prompts[name] = chat_prompt(templates[name])
+    return prompts
+
+
+class CompiledConfig:
+    def __init__(self, config):
+        validate_config(config)
+        self.config = config
+        self.prompts = {
+            (topic["title"], language_style["title"]): compile_prompts(
+                config["templates"],
+                topic,
+                language_style,
+            )
+            for topic in config["topics"]
+            for language_style in config["language_styles"]
+        }
+
+    def get_config(self):
+        # Callers adjust parameters in place, so each gets its own copy
+        return copy.deepcopy(self.config)
+
+
+def get_source_stamp(path):
+    stat = os.stat(path)
+    # Pickled prompt templates are only readable by the versions that
+    # wrote them, so an upgrade invalidates the snapshot too
+    return (
+        SNAPSHOT_VERSION,
+        langchain_core.__version__,
+        pydantic.VERSION,
+        os.path.abspath(path),
+        stat.st_mtime_ns,
+        stat.st_size,
+    )
+
+
+def load_snapshot(snapshot_path, stamp):
+    # The stamp is stored first, so a stale snapshot is rejected before its
+    # templates are unpickled, and any failure is treated as a cache miss
+    try:
+        with open(snapshot_path, "rb") as file:
+            if pickle.load(file) != stamp:
+                return None
+            return pickle.load(file)
+    except Exception:
+        return None
+
+
+def save_snapshot(snapshot_path, stamp, compiled):
+    directory = os.path.dirname(snapshot_path)
+    try:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so readers never see a torn file
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(stamp, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        # A read-only deployment still works, it just compiles every start
+        pass
+
+
+compiled_configs = {}
+compiled_configs_lock = threading.Lock()
+
+
+def load_compiled_config(path, snapshot_path=None):
+    stamp = get_source_stamp(path)
+    with compiled_configs_lock:
+        # Only the latest version of each file is kept in memory
+        cached_stamp, compiled = compiled_configs.get(path, (None, None))
+        if cached_stamp == stamp:
+            return compiled
+
+        compiled = None
+        if snapshot_path:
+            compiled = load_snapshot(snapshot_path, stamp)
+        if compiled is None:
+            with open(path, "r", encoding="utf-8") as file:
+                compiled = CompiledConfig(yaml.safe_load(file))
+            if snapshot_path:
+                save_snapshot(snapshot_path, stamp, compiled)
+
+        compiled_configs[path] = (stamp, compiled)
+        return compiled
@@ -1,25 +1,81 @@
 import os
 
 import streamlit as st
-import yaml
+import toml
+
+from eidos.config_compiler import compile_prompts, load_compiled_config
+
+
+class StreamlitSecrets:
+    def load(self):
+        return st.secrets["env"]
+
+
+class TomlSecrets:
+    def __init__(self, path=".streamlit/secrets.toml"):
+        self.path = path
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            return toml.load(file).get("env", {})
+
+
+class EnvironmentSecrets:
+    def load(self):
+        # Variables are expected to be set by the process environment
+        return {}
 
 
 class Configuration:
-    def __init__(self):
+    def __init__(self, secrets=None):
         self.load_config_file()
-        self.load_environment_variables()
+        self.load_environment_variables(secrets or StreamlitSecrets())
 
-    def load_environment_variables(self):
-        environment_variables = st.secrets["env"]
+    def load_environment_variables(self, secrets):
+        environment_variables = secrets.load()
         for key, value in environment_variables.items():
             os.environ[key] = value
 
-    def load_config_file(self, path="config.yaml"):
-        with open(path, "r", encoding="utf-8") as file:
-            config = yaml.safe_load(file)
-
-        for key, value in config.items():
+    def load_config_file(
+        self,
+        path="config.yaml",
+        snapshot_path=".cache/config_snapshot.pickle",
+    ):
+        # Parsing, validation and prompt compilation happen once per change
+        # of the file, later sessions only copy the compiled result
+        compiled = load_compiled_config(path, snapshot_path)
+        for key, value in compiled.get_config().items():
             setattr(self, key, value)
+        self.compiled_prompts = compiled.prompts
+
+    def find_option(self, options, title):
+        for option in options:
+            if option["title"] == title:
+                return option
+
+        titles = [option["title"] for option in options]
+        raise ValueError(f"{title} not found. Must be one of {titles}")
+
+    def select(self, topic, language_style):
+        self.selected_topic = self.find_option(self.topics, topic)
+        self.selected_language_style = self.find_option(
+            self.language_styles,
+            language_style,
+        )
+
+    def get_prompts(self):
+        key = (
+            self.selected_topic["title"],
+            self.selected_language_style["title"],
+        )
+        if key in self.compiled_prompts:
+            return self.compiled_prompts[key]
+
+        return compile_prompts(
+            self.templates,
+            self.selected_topic,
+            self.selected_language_style,
+        )
 
     def make_selection(self, prompt, options):
         st.markdown(f"#### {prompt}")
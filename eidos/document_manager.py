@@ -1,32 +1,119 @@
 import os
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders.text import TextLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
+import numpy as np
+from langchain_core.documents import Document
+
+from eidos.embedding_cache import CachedEmbeddings, EmbeddingCache
+from eidos.lazy import lazy_attribute
+from eidos.lexical_index import LexicalIndex
+from eidos.local_vectorstore import LocalVectorStore
+from eidos.reranker import MMRRetriever
 
 
 class DocumentManager:
-    def __init__(self, configuration):
+    def __init__(self, configuration, http_client=None):
         self.config = configuration
+        self.http_client = http_client
+
+    # Clients and indexes are created on first use, so sessions that never
+    # retrieve do not pay for the OpenAI and Pinecone imports or connections
+    @lazy_attribute
+    def embedding_model(self):
+        return self.initialize_embedding_model()
+
+    @lazy_attribute
+    def vectorstore(self):
+        return self.initialize_vectorstore()
 
-        self.embedding_model = self.initialize_embedding_model()
-        self.vectorstore = self.initialize_vectorstore()
-        self.retriever = self.get_retriever()
+    @lazy_attribute
+    def lexical_index(self):
+        return self.initialize_lexical_index()
+
+    @lazy_attribute
+    def retriever(self):
+        return self.get_retriever()
 
     def initialize_embedding_model(self):
-        return OpenAIEmbeddings(
-            model=self.config.parameters["embedding_model"],
-            dimensions=self.config.parameters["embedding_dimensions"],
+        from langchain_openai import OpenAIEmbeddings
+
+        model = self.config.parameters["embedding_model"]
+        dimensions = self.config.parameters["embedding_dimensions"]
+        embedding_model = OpenAIEmbeddings(
+            model=model,
+            dimensions=dimensions,
+            http_client=self.http_client,
+        )
+
+        cache_path = self.config.parameters["embedding_cache_path"]
+        if not cache_path:
+            return embedding_model
+
+        cache = EmbeddingCache(
+            cache_path,
+            max_entries=self.config.parameters["embedding_cache_max_entries"],
+        )
+        return CachedEmbeddings(
+            embedding_model,
+            cache,
+            namespace=f"{model}:{dimensions}",
         )
 
     def initialize_vectorstore(self):
-        return PineconeVectorStore(
-            index_name=os.getenv("PINECONE_INDEX_NAME"),
-            embedding=self.embedding_model,
+        backend = self.config.parameters["vectorstore_backend"]
+        if backend == "pinecone":
+            from langchain_pinecone import PineconeVectorStore
+
+            return PineconeVectorStore(
+                index_name=os.getenv("PINECONE_INDEX_NAME"),
+                embedding=self.embedding_model,
+            )
+        if backend == "local":
+            return LocalVectorStore(
+                path=self.config.parameters["local_index_path"],
+                embedding=self.embedding_model,
+                search=self.config.parameters["local_index_search"],
+                n_lists=self.config.parameters["local_index_lists"],
+                n_probes=self.config.parameters["local_index_probes"],
+            )
+        raise ValueError(f"Unknown vectorstore backend: {backend}")
+
+    def initialize_lexical_index(self):
+        path = self.config.parameters["lexical_index_path"]
+        if not path:
+            return None
+        return LexicalIndex(path)
+
+    def search_candidates(self, embedding, fetch_k):
+        if isinstance(self.vectorstore, LocalVectorStore):
+            return self.vectorstore.search_candidates(embedding, fetch_k)
+
+        # Pinecone returns stored vectors alongside matches on request
+        vectorstore = self.vectorstore
+        results = vectorstore._index.query(
+            vector=embedding,
+            top_k=fetch_k,
+            include_values=True,
+            include_metadata=True,
+            namespace=vectorstore._namespace,
         )
+        documents, vectors = [], []
+        for match in results["matches"]:
+            metadata = dict(match["metadata"])
+            text = metadata.pop(vectorstore._text_key)
+            documents.append(Document(page_content=text, metadata=metadata))
+            vectors.append(match["values"])
+        return documents, np.asarray(vectors, dtype=np.float32)
 
     def get_retriever(self):
+        if self.config.parameters["search_type"] == "mmr":
+            return MMRRetriever(
+                embedding=self.embedding_model,
+                search_candidates=self.search_candidates,
+                k=self.config.parameters["docs_to_use"],
+                fetch_k=self.config.parameters["docs_to_process"],
+                lambda_mult=self.config.parameters["mmr_lambda"],
+            )
+
         return self.vectorstore.as_retriever(
             search_type=self.config.parameters["search_type"],
             search_kwargs={
@@ -42,14 +129,26 @@ class DocumentManager:
             file_type = filename.split(".")[-1]
             if file_type not in valid_file_types:
                 continue
-            doc_loader = TextLoader(
-                os.path.join(path, filename),
-                encoding="utf-8",
-            )
-            docs.extend(doc_loader.load())
+            docs.extend(self.load_document(os.path.join(path, filename)))
         return docs
 
+    def get_document_paths(self, path="documents"):
+        valid_file_types = self.config.parameters["allowed_file_types"]
+        with os.scandir(path) as entries:
+            for entry in entries:
+                file_type = entry.name.split(".")[-1]
+                if entry.is_file() and file_type in valid_file_types:
+                    yield entry.path
+
+    def load_document(self, file_path):
+        from langchain_community.document_loaders.text import TextLoader
+
+        doc_loader = TextLoader(file_path, encoding="utf-8")
+        return doc_loader.load()
+
     def split_documents(self, documents):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.config.parameters["embedding_chunk_size"],
             chunk_overlap=self.config.parameters["embedding_chunk_overlap"],
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# SQLite caps the number of host parameters in a single statement
+QUERY_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    def __init__(self, path, max_entries):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_accessed_at
+                ON embeddings (accessed_at);
+            """
+        )
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), QUERY_BATCH_SIZE):
+                batch = keys[start : start + QUERY_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self.connection.execute(
+                    "SELECT key, vector FROM embeddings"
+                    f" WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, np.float32).tolist()
+
+                self.connection.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                    [(time.time(), key) for key, _ in rows],
+                )
+            self.connection.commit()
+        return found
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                rows,
+            )
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        (count,) = self.connection.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+
+        # Least recently used entries go first
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+            (excess,),
+        )
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, cache, namespace):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+
+    def make_key(self, text):
+        content = f"{self.namespace}\0{text}".encode("utf-8")
+        return hashlib.sha256(content).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self.make_key(text) for text in texts]
+        vectors = self.cache.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+
+        if missing:
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), embedded))
+            self.cache.set_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self.make_key(text)
+        vectors = self.cache.get_many([key])
+        if key in vectors:
+            return vectors[key]
+
+        vector = self.embeddings.embed_query(text)
+        self.cache.set_many({key: vector})
+        return vector
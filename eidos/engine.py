@@ -0,0 +1,132 @@
+import copy
+import threading
+import time
+import uuid
+
+from eidos.chatbot import ignore_progress
+from eidos.persistence import create_conversation_document
+from eidos.registry import PipelineRegistry
+from eidos.session_history import SessionHistory
+
+
+class SessionNotFoundError(KeyError):
+    pass
+
+
+class ConversationEndedError(RuntimeError):
+    pass
+
+
+class Session:
+    def __init__(self, pipeline):
+        self.id = uuid.uuid4().hex
+        self.pipeline = pipeline
+        self.history = SessionHistory()
+        self.chat_count = 0
+        self.lock = threading.Lock()
+        self.touch()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def get_messages(self):
+        return [
+            {"type": record.type, **record.to_content()}
+            for record in self.history.records
+        ]
+
+
+class ChatbotEngine:
+    def __init__(self, configuration):
+        self.config = configuration
+        self.registry = PipelineRegistry(configuration.parameters)
+        self.session_ttl = self.config.parameters["session_ttl"]
+
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def get_pipeline(self, topic, language_style):
+        config = copy.copy(self.config)
+        config.select(topic, language_style)
+        return self.registry.get_pipeline(config)
+
+    def evict_idle_sessions(self):
+        cutoff = time.monotonic() - self.session_ttl
+        with self.lock:
+            for session_id, session in list(self.sessions.items()):
+                if session.last_active < cutoff:
+                    del self.sessions[session_id]
+
+    def create_session(self, topic, language_style):
+        self.evict_idle_sessions()
+        session = Session(self.get_pipeline(topic, language_style))
+        greeting = session.pipeline.get_greeting()
+        session.history.add_ai_message(greeting)
+
+        with self.lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get_session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+
+        session.touch()
+        return session
+
+    def is_finished(self, session):
+        return session.chat_count >= self.config.parameters["max_k_chat"]
+
+    def send_message(self, session_id, message, progress=ignore_progress):
+        session = self.get_session(session_id)
+        with session.lock:
+            if self.is_finished(session):
+                raise ConversationEndedError(session_id)
+
+            response = session.pipeline.get_response(
+                message,
+                session.history,
+                progress=progress,
+            )
+            session.history.add_user_message(message)
+            session.history.add_ai_message(
+                response["message"],
+                context=response["context"],
+            )
+            session.chat_count += 1
+            self.save_session(session)
+
+        return {**response, "finished": self.is_finished(session)}
+
+    def save_session(self, session):
+        writer = self.registry.conversation_writer
+        if writer is None:
+            return
+
+        writer.save(
+            session.id,
+            create_conversation_document(
+                session.pipeline.config,
+                session.history,
+            ),
+        )
+
+    def wrap_up(self, session_id, progress=ignore_progress):
+        session = self.get_session(session_id)
+        pipeline = session.pipeline
+        jobs = {
+            "summary": pipeline.get_summary,
+            "advices": pipeline.get_belief_advices,
+            "readings": pipeline.get_suggested_readings,
+        }
+        futures = {
+            name: pipeline.executor.submit(
+                job,
+                session.history,
+                progress=progress,
+            )
+            for name, job in jobs.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,142 @@
+import hashlib
+import random
+import time
+import typing
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+from langchain_core.runnables import RunnableLambda
+
+VOCABULARY = (
+    "belief reason virtue knowledge truth beauty justice argument premise"
+    " conclusion duty happiness mind world language meaning value freedom"
+    " experience perception doubt certainty nature art taste ethics logic"
+).split()
+
+
+def make_seed(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def make_words(seed, count):
+    generator = random.Random(seed)
+    return [generator.choice(VOCABULARY) for _ in range(count)]
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.5
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 60
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def get_prompt(self, messages):
+        return "\n".join(str(message.content) for message in messages)
+
+    def get_token_usage(self, prompt):
+        return {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": len(prompt.split()) + self.completion_tokens,
+        }
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self.get_prompt(messages)
+        words = make_words(make_seed(prompt), self.completion_tokens)
+        time.sleep(self.latency + len(words) / self.tokens_per_second)
+
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(" ".join(words)))],
+            llm_output={"token_usage": self.get_token_usage(prompt)},
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self.get_prompt(messages)
+        words = make_words(make_seed(prompt), self.completion_tokens)
+        time.sleep(self.latency)
+
+        for index, word in enumerate(words):
+            time.sleep(1 / self.tokens_per_second)
+            token = word if index == 0 else f" {word}"
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def build_value(self, annotation, generator, text):
+        origin = typing.get_origin(annotation)
+        if origin is typing.Literal:
+            return generator.choice(typing.get_args(annotation))
+        if origin in (list, List):
+            item_annotation = typing.get_args(annotation)[0]
+            return [
+                self.build_value(item_annotation, generator, text)
+                for _ in range(generator.randint(2, 4))
+            ]
+        words = text.split()
+        start = generator.randrange(max(len(words) - 12, 1))
+        return " ".join(words[start : start + 12])
+
+    def build_structured(self, schema, message):
+        # The generated text seeds the fields, so outputs stay deterministic
+        generator = random.Random(make_seed(message.content))
+        values = {
+            name: self.build_value(field.outer_type_, generator, message.content)
+            for name, field in schema.__fields__.items()
+        }
+        return schema(**values)
+
+    def with_structured_output(self, schema, **kwargs):
+        return self | RunnableLambda(
+            lambda message: self.build_structured(schema, message)
+        )
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dimensions=1536, latency=0.05):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def embed(self, text):
+        generator = np.random.default_rng(make_seed(text))
+        vector = generator.standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self.embed(text)
+
+
+class FakeSearchBackend:
+    def __init__(self, latency=0.2, sites=3):
+        self.latency = latency
+        self.sites = sites
+
+    def search(self, query, num_results):
+        time.sleep(self.latency)
+        results = []
+        for index in range(num_results):
+            # Few distinct sites so queries overlap like real search results
+            seed = make_seed(query) % self.sites + index
+            words = make_words(seed, 4)
+            results.append(
+                {
+                    "title": " ".join(words).title(),
+                    "link": f"https://plato.example.org/entries/{seed}/",
+                    "snippet": " ".join(make_words(make_seed(query), 20)),
+                }
+            )
+        return results
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.messages import SystemMessage
+
+# Tokens added by the chat format around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class HistoryWindow:
+    def __init__(self, summarize, model, token_budget, keep_ratio, max_cached):
+        self.summarize = summarize
+        self.encoding = get_encoding(model)
+        self.token_budget = token_budget
+        self.keep_budget = int(token_budget * keep_ratio)
+        self.max_cached = max_cached
+
+        self.lock = threading.Lock()
+        self.summaries = OrderedDict()
+        self.count_tokens = lru_cache(maxsize=4096)(self.count_text_tokens)
+
+    def count_text_tokens(self, text):
+        return len(self.encoding.encode(text)) + MESSAGE_OVERHEAD_TOKENS
+
+    def get_prefix_keys(self, messages):
+        # keys[n] identifies the first n messages of the conversation
+        digest = hashlib.sha256()
+        keys = [digest.hexdigest()]
+        for message in messages:
+            digest.update(f"{message.type}\0{message.content}\0".encode())
+            keys.append(digest.hexdigest())
+        return keys
+
+    def get_cached_summary(self, keys):
+        with self.lock:
+            for folded in range(len(keys) - 1, 0, -1):
+                if keys[folded] in self.summaries:
+                    self.summaries.move_to_end(keys[folded])
+                    return folded, self.summaries[keys[folded]]
+        return 0, None
+
+    def store_summary(self, key, summary):
+        with self.lock:
+            self.summaries[key] = summary
+            while len(self.summaries) > self.max_cached:
+                self.summaries.popitem(last=False)
+
+    def make_summary_message(self, summary):
+        return SystemMessage(f"Summary of our earlier conversation:\n{summary}")
+
+    def count_messages(self, messages):
+        return sum(self.count_tokens(message.content) for message in messages)
+
+    def fit(self, messages):
+        if self.count_messages(messages) <= self.token_budget:
+            return messages
+
+        keys = self.get_prefix_keys(messages)
+        folded, summary = self.get_cached_summary(keys)
+        window = [self.make_summary_message(summary)] if summary else []
+        window.extend(messages[folded:])
+        if self.count_messages(window) <= self.token_budget:
+            return window
+
+        # Fold turns until the recent ones fit the keep budget, which leaves
+        # headroom so the next few turns reuse this summary
+        tokens = self.count_messages(window)
+        fold_until = folded
+        while fold_until < len(messages) - 1 and tokens > self.keep_budget:
+            tokens -= self.count_tokens(messages[fold_until].content)
+            fold_until += 1
+
+        to_fold = window[: len(window) - (len(messages) - fold_until)]
+        summary = self.summarize(to_fold)
+        self.store_summary(keys[fold_until], summary)
+        return [self.make_summary_message(summary), *messages[fold_until:]]
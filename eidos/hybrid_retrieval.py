@@ -0,0 +1,62 @@
+import threading
+
+from langchain_core.runnables import RunnableLambda
+
+from eidos.reranker import reciprocal_rank_fusion
+
+
+class HybridRetrieval:
+    def __init__(self, lexical_index, k, fetch_k, fast_path_threshold):
+        self.lexical_index = lexical_index
+        self.k = k
+        self.fetch_k = fetch_k
+        self.fast_path_threshold = fast_path_threshold
+
+        self.lock = threading.Lock()
+        self.counts = {"fast_path": 0, "fused": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+
+        total = stats["fast_path"] + stats["fused"]
+        stats["fast_path_rate"] = stats["fast_path"] / total if total else 0.0
+        return stats
+
+    def is_strong(self, documents, strength):
+        return (
+            bool(documents)
+            and self.fast_path_threshold is not None
+            and strength >= self.fast_path_threshold
+        )
+
+    def wrap(self, chain_expansion, retriever, input_key="user_message"):
+        def route(inputs):
+            documents, strength = self.lexical_index.search(
+                inputs[input_key],
+                self.fetch_k,
+            )
+            if self.is_strong(documents, strength):
+                # Exact terms matched well, so expansion and embedding are
+                # skipped altogether
+                self.count("fast_path")
+                return documents[: self.k]
+
+            # Returning a runnable lets it run as a child of this step
+            self.count("fused")
+            return (
+                chain_expansion
+                | retriever
+                | RunnableLambda(
+                    lambda vector_documents: reciprocal_rank_fusion(
+                        [vector_documents, documents],
+                        self.k,
+                    )
+                )
+            )
+
+        return RunnableLambda(route)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bytes read at a time when hashing files
+HASH_BLOCK_SIZE = 1 << 20
+
+# Files ingested between checkpoints. Saving the lexical index rewrites all
+# of its postings, so saving after every file makes a run quadratic
+SAVE_INTERVAL = 50
+
+
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(source, text):
+    content = f"{source}\0{text}".encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class IngestionPipeline:
+    def __init__(self, document_manager):
+        self.document_manager = document_manager
+        parameters = document_manager.config.parameters
+
+        self.manifest_path = parameters["ingestion_manifest_path"]
+        self.batch_size = parameters["ingestion_batch_size"]
+        self.max_workers = parameters["ingestion_workers"]
+        self.lexical_index = document_manager.lexical_index
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def save_manifest(self, manifest):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=4, sort_keys=True)
+        os.replace(temporary_path, self.manifest_path)
+
+    def get_chunks(self, file_path, source):
+        documents = self.document_manager.load_document(file_path)
+        chunks = {}
+        for chunk in self.document_manager.split_documents(documents):
+            chunk.metadata["source"] = source
+            # Identical chunks within a file collapse onto one id
+            chunks.setdefault(make_chunk_id(source, chunk.page_content), chunk)
+        return chunks
+
+    def ingest_file(self, file_path, source):
+        chunks = self.get_chunks(file_path, source)
+        ids = list(chunks)
+        vectorstore = self.document_manager.vectorstore
+        for start in range(0, len(ids), self.batch_size):
+            batch_ids = ids[start : start + self.batch_size]
+            vectorstore.add_documents(
+                [chunks[chunk_id] for chunk_id in batch_ids],
+                ids=batch_ids,
+            )
+        if self.lexical_index:
+            self.lexical_index.add_documents(chunks.values(), ids)
+        return ids
+
+    def delete_chunks(self, ids):
+        if ids:
+            self.document_manager.vectorstore.delete(ids=list(ids))
+            if self.lexical_index:
+                self.lexical_index.delete(ids)
+
+    def save(self, manifest):
+        # The lexical index is written first so the manifest never lists
+        # chunks it is missing
+        if self.lexical_index:
+            self.lexical_index.save()
+        self.save_manifest(manifest)
+
+    def find_changes(self, path, manifest):
+        changed = []
+        sources = set()
+        for file_path in self.document_manager.get_document_paths(path):
+            source = os.path.relpath(file_path, path)
+            sources.add(source)
+            digest = hash_file(file_path)
+            if manifest.get(source, {}).get("hash") != digest:
+                changed.append((file_path, source, digest))
+
+        removed = sorted(set(manifest) - sources)
+        return changed, removed
+
+    def run(self, path="documents"):
+        manifest = self.load_manifest()
+        changed, removed = self.find_changes(path, manifest)
+        stats = {
+            "changed_files": len(changed),
+            "removed_files": len(removed),
+            "upserted_chunks": 0,
+            "deleted_chunks": 0,
+        }
+
+        for source in removed:
+            ids = manifest.pop(source)["ids"]
+            self.delete_chunks(ids)
+            stats["deleted_chunks"] += len(ids)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                (
+                    source,
+                    digest,
+                    executor.submit(self.ingest_file, file_path, source),
+                )
+                for file_path, source, digest in changed
+            ]
+
+            # The manifest is saved every few files so an interrupted run
+            # resumes, and re-ingesting a file that was not saved yet just
+            # upserts the same chunk ids again
+            for count, (source, digest, future) in enumerate(futures, 1):
+                ids = future.result()
+                previous_ids = manifest.get(source, {}).get("ids", [])
+                stale_ids = set(previous_ids) - set(ids)
+                self.delete_chunks(stale_ids)
+
+                manifest[source] = {"hash": digest, "ids": ids}
+                stats["upserted_chunks"] += len(ids)
+                stats["deleted_chunks"] += len(stale_ids)
+                if count % SAVE_INTERVAL == 0:
+                    self.save(manifest)
+
+        if changed or removed:
+            self.save(manifest)
+        return stats
@@ -0,0 +1,189 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+def empty_stage():
+    return {
+        "seconds": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "llm_calls": 0,
+        "cache_hits": 0,
+    }
+
+
+class StageMetrics:
+    def __init__(self, max_samples=1000, export_path=None):
+        self.export_path = export_path
+        self.lock = threading.Lock()
+        self.durations = defaultdict(lambda: deque(maxlen=max_samples))
+        self.totals = defaultdict(empty_stage)
+
+    @contextmanager
+    def track_turn(self):
+        turn = defaultdict(empty_stage)
+        token = current_turn.set(turn)
+        try:
+            yield turn
+        finally:
+            current_turn.reset(token)
+
+    def add(self, stage, key, value):
+        with self.lock:
+            self.totals[stage][key] += value
+            turn = current_turn.get()
+            if turn is not None:
+                turn[stage][key] += value
+
+    def record_duration(self, stage, seconds):
+        with self.lock:
+            self.durations[stage].append(seconds)
+        self.add(stage, "seconds", seconds)
+
+    def record_tokens(self, stage, prompt_tokens, completion_tokens):
+        self.add(stage, "prompt_tokens", prompt_tokens)
+        self.add(stage, "completion_tokens", completion_tokens)
+
+    def record_llm_call(self, stage):
+        self.add(stage, "llm_calls", 1)
+
+    def record_cache_hit(self, stage):
+        self.add(stage, "cache_hits", 1)
+
+    def summarize(self):
+        with self.lock:
+            summary = {}
+            for stage, totals in self.totals.items():
+                durations = np.asarray(self.durations[stage] or [0.0])
+                summary[stage] = {
+                    "count": len(self.durations[stage]),
+                    "p50_seconds": float(np.percentile(durations, 50)),
+                    "p95_seconds": float(np.percentile(durations, 95)),
+                    **totals,
+                }
+            return summary
+
+    def format_prometheus(self, summary):
+        lines = [
+            "# TYPE eidos_stage_latency_seconds summary",
+            "# TYPE eidos_stage_tokens_total counter",
+            "# TYPE eidos_stage_llm_calls_total counter",
+            "# TYPE eidos_stage_cache_hits_total counter",
+        ]
+        for stage, values in summary.items():
+            label = f'stage="{stage}"'
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95")):
+                lines.append(
+                    f"eidos_stage_latency_seconds"
+                    f'{{{label},quantile="{quantile}"}}'
+                    f" {values[f'{key}_seconds']}"
+                )
+            lines.extend(
+                [
+                    f"eidos_stage_latency_seconds_sum{{{label}}}"
+                    f" {values['seconds']}",
+                    f"eidos_stage_latency_seconds_count{{{label}}}"
+                    f" {values['count']}",
+                    f'eidos_stage_tokens_total{{{label},kind="prompt"}}'
+                    f" {values['prompt_tokens']}",
+                    f'eidos_stage_tokens_total{{{label},kind="completion"}}'
+                    f" {values['completion_tokens']}",
+                    f"eidos_stage_llm_calls_total{{{label}}}"
+                    f" {values['llm_calls']}",
+                    f"eidos_stage_cache_hits_total{{{label}}}"
+                    f" {values['cache_hits']}",
+                ]
+            )
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        if not self.export_path:
+            return
+
+        os.makedirs(self.export_path, exist_ok=True)
+        summary = self.summarize()
+        outputs = {
+            "metrics.json": json.dumps(summary, indent=4),
+            "metrics.prom": self.format_prometheus(summary),
+        }
+        for filename, content in outputs.items():
+            path = os.path.join(self.export_path, filename)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(f"{path}.tmp", path)
+
+
+class StageCallbackHandler(BaseCallbackHandler):
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+        self.lock = threading.Lock()
+        self.starts = {}
+        self.streamed_tokens = defaultdict(int)
+
+    def start(self, run_id, parent_run_id):
+        with self.lock:
+            # Only the outermost run of the instrumented chain is timed
+            if parent_run_id in self.starts:
+                self.starts[run_id] = None
+            else:
+                self.starts[run_id] = time.perf_counter()
+
+    def finish(self, run_id):
+        with self.lock:
+            start = self.starts.pop(run_id, None)
+        if start is not None:
+            duration = time.perf_counter() - start
+            self.metrics.record_duration(self.stage, duration)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        self.start(run_id, kwargs.get("parent_run_id"))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self.finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.finish(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self.start(run_id, kwargs.get("parent_run_id"))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self.finish(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self.finish(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.start(run_id, kwargs.get("parent_run_id"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self.start(run_id, kwargs.get("parent_run_id"))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        self.streamed_tokens[run_id] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        streamed_tokens = self.streamed_tokens.pop(run_id, 0)
+        self.metrics.record_tokens(
+            self.stage,
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", streamed_tokens),
+        )
+        self.metrics.record_llm_call(self.stage)
+        self.finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.streamed_tokens.pop(run_id, None)
+        self.finish(run_id)
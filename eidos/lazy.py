@@ -0,0 +1,28 @@
+import threading
+
+
+class lazy_attribute:
+    # Like functools.cached_property, but the value is built at most once
+    # per instance even when several worker threads ask for it together
+    def __init__(self, create):
+        self.create = create
+        self.name = create.__name__
+        self.__doc__ = create.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        values = instance.__dict__
+        if self.name in values:
+            return values[self.name]
+
+        # Building one attribute may need another, so the lock is reentrant
+        lock = values.setdefault("_lazy_attribute_lock", threading.RLock())
+        with lock:
+            if self.name not in values:
+                values[self.name] = self.create(instance)
+        return values[self.name]
@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """
+    a about after all also an and any are as at be because been but by can
+    could did do does for from had has have he her his how i if in into is
+    it its just me more my no not of on or our she so some such than that
+    the their them then there these they this to was we were what when which
+    who why will with would you your
+    """.split()
+)
+
+
+def tokenize(text):
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self.load()
+
+    @property
+    def records_path(self):
+        return os.path.join(self.path, "records.json")
+
+    @property
+    def postings_path(self):
+        return os.path.join(self.path, "postings.npz")
+
+    def load(self):
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "r", encoding="utf-8") as file:
+                self.records = json.load(file)
+        else:
+            self.records = []
+        self.positions = {r["id"]: i for i, r in enumerate(self.records)}
+
+        self.postings = None
+        if os.path.exists(self.postings_path):
+            postings = dict(np.load(self.postings_path))
+            if len(postings["doc_lengths"]) == len(self.records):
+                self.set_postings(postings)
+
+    def set_postings(self, postings):
+        self.postings = postings
+        self.term_ids = {
+            term: i for i, term in enumerate(postings["terms"].tolist())
+        }
+
+    def build_postings(self):
+        # Postings are stored term by term in flat arrays, like a CSR matrix
+        term_postings = defaultdict(list)
+        doc_lengths = np.zeros(len(self.records), dtype=np.int32)
+        for row, record in enumerate(self.records):
+            counts = Counter(tokenize(record["text"]))
+            doc_lengths[row] = sum(counts.values())
+            for term, frequency in counts.items():
+                term_postings[term].append((row, frequency))
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(term_postings[t]) for t in terms])
+        rows = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            postings = np.asarray(term_postings[term])
+            rows[offsets[i] : offsets[i + 1]] = postings[:, 0]
+            frequencies[offsets[i] : offsets[i + 1]] = np.minimum(
+                postings[:, 1],
+                np.iinfo(np.uint16).max,
+            )
+
+        return {
+            "terms": np.asarray(terms, dtype=np.str_),
+            "offsets": offsets,
+            "rows": rows,
+            "frequencies": frequencies,
+            "doc_lengths": doc_lengths,
+        }
+
+    def get_postings(self):
+        if self.postings is None and self.records:
+            self.set_postings(self.build_postings())
+        return self.postings
+
+    def add_documents(self, documents, ids):
+        with self.lock:
+            for id_, document in zip(ids, documents):
+                record = {
+                    "id": id_,
+                    "text": document.page_content,
+                    "metadata": document.metadata,
+                }
+                if id_ in self.positions:
+                    self.records[self.positions[id_]] = record
+                else:
+                    self.positions[id_] = len(self.records)
+                    self.records.append(record)
+            self.postings = None
+
+    def delete(self, ids):
+        with self.lock:
+            removed = {self.positions[i] for i in ids if i in self.positions}
+            if not removed:
+                return
+
+            self.records = [
+                record
+                for row, record in enumerate(self.records)
+                if row not in removed
+            ]
+            self.positions = {r["id"]: i for i, r in enumerate(self.records)}
+            self.postings = None
+
+    def save(self):
+        with self.lock:
+            postings = self.get_postings()
+
+            # Write to temporary files first so readers never see a torn index
+            records_tmp = f"{self.records_path}.tmp"
+            with open(records_tmp, "w", encoding="utf-8") as file:
+                json.dump(self.records, file)
+
+            postings_tmp = f"{self.postings_path}.tmp"
+            if postings is not None:
+                with open(postings_tmp, "wb") as file:
+                    np.savez(file, **postings)
+
+            os.replace(records_tmp, self.records_path)
+            if postings is not None:
+                os.replace(postings_tmp, self.postings_path)
+            elif os.path.exists(self.postings_path):
+                os.remove(self.postings_path)
+
+    def search(self, query, k):
+        with self.lock:
+            postings = self.get_postings()
+            records = self.records
+        terms = set(tokenize(query))
+        if postings is None or not terms:
+            return [], 0.0
+
+        offsets = postings["offsets"]
+        doc_lengths = postings["doc_lengths"]
+        length_norm = self.k1 * (
+            1 - self.b + self.b * doc_lengths / max(doc_lengths.mean(), 1)
+        )
+        scores = np.zeros(len(records), dtype=np.float32)
+
+        for term in terms:
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+
+            start, end = offsets[term_id], offsets[term_id + 1]
+            matches = end - start
+            idf = np.log(1 + (len(records) - matches + 0.5) / (matches + 0.5))
+            rows = postings["rows"][start:end]
+            frequencies = postings["frequencies"][start:end].astype(np.float32)
+            scores[rows] += (
+                idf
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + length_norm[rows])
+            )
+
+        matched = int(np.count_nonzero(scores))
+        k = min(k, matched)
+        if k <= 0:
+            return [], 0.0
+
+        # The runner-up is needed for the strength even when k is 1
+        n = min(max(k, 2), matched)
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        documents = [
+            Document(
+                page_content=records[row]["text"],
+                metadata=dict(records[row]["metadata"]),
+            )
+            for row in top[:k]
+        ]
+
+        # Strength is the relative margin of the best chunk over the next
+        # one. Common words match many chunks about equally well, so only a
+        # chunk that stands out, usually through rare terms, scores high
+        best = float(scores[top[0]])
+        runner_up = float(scores[top[1]]) if n > 1 else 0.0
+        strength = (best - runner_up) / best
+        return documents, strength
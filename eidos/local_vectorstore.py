@@ -0,0 +1,387 @@
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from eidos.reranker import mmr_rerank, normalize
+
+
+class LocalIndexState:
+    def __init__(self, records, vectors, positions, live_rows):
+        self.records = records
+        self.vectors = vectors
+        self.positions = positions
+        self.live_rows = live_rows
+        self.ivf = None
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(
+        self,
+        path,
+        embedding,
+        search="exact",
+        n_lists=64,
+        n_probes=8,
+        kmeans_iterations=10,
+    ):
+        if search not in ("exact", "ivf"):
+            raise ValueError(f"Unknown search mode: {search}")
+
+        self.path = path
+        self._embedding = embedding
+        self.search = search
+        self.n_lists = n_lists
+        self.n_probes = n_probes
+        self.kmeans_iterations = kmeans_iterations
+        self.lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self.load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    @property
+    def records_path(self):
+        return os.path.join(self.path, "records.jsonl")
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def ivf_path(self):
+        return os.path.join(self.path, "ivf.npz")
+
+    # Vectors and records are append-only logs. Replaced and deleted rows
+    # stay on disk as dead rows until compaction rewrites both files, so a
+    # batch costs time proportional to its own size, not to the corpus
+    def load(self):
+        dimensions = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                dimensions = json.load(file)["dimensions"]
+
+        records, positions = [], {}
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "r+", encoding="utf-8") as file:
+                offset = 0
+                for line in iter(file.readline, ""):
+                    if not line.endswith("\n"):
+                        # A torn last line from an interrupted write
+                        break
+                    offset += len(line.encode("utf-8"))
+                    entry = json.loads(line)
+                    if entry.get("deleted"):
+                        positions.pop(entry["id"], None)
+                        continue
+                    positions[entry["id"]] = len(records)
+                    records.append(entry)
+                file.truncate(offset)
+
+        # Vectors without a record come from an interrupted write
+        if os.path.exists(self.vectors_path):
+            os.truncate(self.vectors_path, len(records) * dimensions * 4)
+
+        self.dimensions = dimensions
+        self.set_state(records, positions, load_ivf=True)
+
+    def set_state(self, records, positions, load_ivf=False):
+        if records:
+            vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(records), self.dimensions),
+            )
+        else:
+            vectors = np.empty((0, self.dimensions), dtype=np.float32)
+
+        live_rows = None
+        if len(positions) < len(records):
+            live_rows = np.fromiter(sorted(positions.values()), np.int64)
+
+        ivf = None
+        if load_ivf and self.search == "ivf" and os.path.exists(self.ivf_path):
+            ivf = dict(np.load(self.ivf_path))
+            if int(ivf.get("rows", -1)) != len(records):
+                ivf = None
+
+        # Readers take the state in one attribute read, so they never see
+        # records and vectors from different versions of the index
+        self.state = LocalIndexState(records, vectors, positions, live_rows)
+        self.state.ivf = ivf
+
+    @property
+    def records(self):
+        state = self.state
+        if state.live_rows is None:
+            return state.records
+        return [state.records[row] for row in state.live_rows]
+
+    def append(self, entries, vectors):
+        state = self.state
+        if not self.dimensions:
+            self.dimensions = int(vectors.shape[1])
+            with open(self.meta_path, "w", encoding="utf-8") as file:
+                json.dump({"dimensions": self.dimensions}, file)
+
+        # Vectors go first, so a crash leaves at most unreferenced vectors
+        if len(vectors):
+            with open(self.vectors_path, "ab") as file:
+                np.ascontiguousarray(vectors, dtype=np.float32).tofile(file)
+        with open(self.records_path, "a", encoding="utf-8") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in entries)
+
+        records = list(state.records)
+        positions = dict(state.positions)
+        for entry in entries:
+            if entry.get("deleted"):
+                positions.pop(entry["id"], None)
+            else:
+                positions[entry["id"]] = len(records)
+                records.append(entry)
+
+        if os.path.exists(self.ivf_path):
+            os.remove(self.ivf_path)
+
+        if len(records) - len(positions) > len(positions):
+            self.compact(records, positions)
+        else:
+            self.set_state(records, positions)
+
+    def compact(self, records=None, positions=None):
+        state = self.state
+        records = state.records if records is None else records
+        positions = state.positions if positions is None else positions
+        if not positions:
+            for path in (self.records_path, self.vectors_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.set_state([], {})
+            return
+
+        # Map the appended vectors again, the state may predate them
+        vectors = np.memmap(
+            self.vectors_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(len(records), self.dimensions),
+        )
+        rows = sorted(positions.values())
+        self.write_index([records[row] for row in rows], vectors[rows])
+
+    def write_index(self, records, vectors):
+        # Write to temporary files first so readers never see a torn index
+        vectors_tmp = f"{self.vectors_path}.tmp"
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(vectors_tmp)
+
+        records_tmp = f"{self.records_path}.tmp"
+        with open(records_tmp, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+
+        with open(self.meta_path, "w", encoding="utf-8") as file:
+            json.dump({"dimensions": self.dimensions}, file)
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(records_tmp, self.records_path)
+        if os.path.exists(self.ivf_path):
+            os.remove(self.ivf_path)
+
+        positions = {record["id"]: i for i, record in enumerate(records)}
+        self.set_state(records, positions)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+
+        # Only the last occurrence of an id within the batch is stored
+        latest = {id_: i for i, id_ in enumerate(ids)}
+        indices = sorted(latest.values())
+        new_vectors = normalize(
+            self._embedding.embed_documents([texts[i] for i in indices])
+        )
+        entries = [
+            {"id": ids[i], "text": texts[i], "metadata": metadatas[i]}
+            for i in indices
+        ]
+
+        with self.lock:
+            self.append(entries, new_vectors)
+
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return False
+
+        with self.lock:
+            positions = self.state.positions
+            removed = sorted({i for i in ids if i in positions})
+            if not removed:
+                return False
+
+            entries = [{"id": id_, "deleted": True} for id_ in removed]
+            self.append(entries, np.empty((0, self.dimensions), np.float32))
+
+        return True
+
+    def build_ivf(self, state):
+        # Spherical k-means over the normalized live vectors
+        rows = state.live_rows
+        if rows is None:
+            rows = np.arange(len(state.records))
+        vectors = np.asarray(state.vectors[rows])
+        n_lists = min(self.n_lists, len(vectors))
+        generator = np.random.default_rng(0)
+        centroids = vectors[
+            generator.choice(len(vectors), n_lists, replace=False)
+        ]
+
+        for _ in range(self.kmeans_iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(
+            assignments[order],
+            np.arange(n_lists + 1),
+        ).astype(np.int64)
+
+        state.ivf = {
+            "centroids": centroids,
+            "order": rows[order],
+            "offsets": offsets,
+            "rows": np.int64(len(state.records)),
+        }
+        if state is self.state:
+            np.savez(self.ivf_path, **state.ivf)
+
+    def candidate_rows(self, state, query):
+        if self.search == "exact":
+            return None
+
+        with self.lock:
+            if state.ivf is None:
+                self.build_ivf(state)
+            ivf = state.ivf
+
+        centroid_scores = ivf["centroids"] @ query
+        n_probes = min(self.n_probes, len(centroid_scores))
+        probes = np.argpartition(-centroid_scores, n_probes - 1)[:n_probes]
+        offsets = ivf["offsets"]
+        return np.concatenate(
+            [ivf["order"][offsets[p] : offsets[p + 1]] for p in probes]
+        )
+
+    def search_vectors(self, state, embedding, k):
+        if not state.positions:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+
+        query = normalize(embedding)
+        rows = self.candidate_rows(state, query)
+        if rows is None and state.live_rows is None:
+            rows = np.arange(len(state.records))
+            scores = state.vectors @ query
+        elif rows is None:
+            rows = state.live_rows
+            scores = (state.vectors @ query)[rows]
+        else:
+            scores = state.vectors[rows] @ query
+
+        k = min(k, len(rows))
+        if k <= 0:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def to_document(self, state, row):
+        record = state.records[row]
+        return Document(
+            page_content=record["text"],
+            metadata=dict(record["metadata"]),
+        )
+
+    def search_candidates(self, embedding, fetch_k):
+        state = self.state
+        rows, _ = self.search_vectors(state, embedding, fetch_k)
+        documents = [self.to_document(state, row) for row in rows]
+        return documents, np.asarray(state.vectors[rows])
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        state = self.state
+        rows, scores = self.search_vectors(state, embedding, k)
+        return [
+            (self.to_document(state, row), float(score))
+            for row, score in zip(rows, scores)
+        ]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        results = self.similarity_search_by_vector_with_score(embedding, k)
+        return [document for document, _ in results]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding,
+        k=4,
+        fetch_k=20,
+        lambda_mult=0.5,
+        **kwargs,
+    ):
+        documents, vectors = self.search_candidates(embedding, fetch_k)
+        selected = mmr_rerank(embedding, vectors, k, lambda_mult=lambda_mult)
+        return [documents[i] for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query,
+        k=4,
+        fetch_k=20,
+        lambda_mult=0.5,
+        **kwargs,
+    ):
+        embedding = self._embedding.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,259 @@
+import atexit
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects batched writes with more operations than this
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def create_conversation_document(configuration, history):
+    # Same fields as the stored conversations read by the export scripts
+    return {
+        "timestamp": datetime.now(timezone.utc),
+        "topic": configuration.selected_topic["title"],
+        "language_style": configuration.selected_language_style["title"],
+        "messages": history.to_dicts(),
+    }
+
+
+def create_firestore_client(
+    certificate=None,
+    emulator_host=None,
+    project=None,
+):
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from google.cloud import firestore as google_firestore
+
+    if emulator_host:
+        from google.auth.credentials import AnonymousCredentials
+
+        # The client only reads FIRESTORE_EMULATOR_HOST when it is created
+        # and opens its channel lazily, so setting the host on this client
+        # avoids changing the environment of the whole process
+        client = google_firestore.Client(
+            project=project,
+            credentials=AnonymousCredentials(),
+        )
+        client._emulator_host = emulator_host
+        return client
+
+    try:
+        app = firebase_admin.get_app()
+    except ValueError:
+        credential = None
+        if certificate:
+            credential = credentials.Certificate(dict(certificate))
+        app = firebase_admin.initialize_app(credential)
+    return firestore.client(app)
+
+
+class FirestoreSink:
+    def __init__(self, collection, create_client):
+        self.collection = collection
+        self.create_client = create_client
+        self.client = None
+
+    def write(self, documents):
+        # The client is created on the writer thread so a missing
+        # credential never fails a page load
+        if self.client is None:
+            self.client = self.create_client()
+        collection = self.client.collection(self.collection)
+
+        items = list(documents.items())
+        for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+            batch = self.client.batch()
+            for id_, document in items[start : start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(collection.document(id_), document)
+            batch.commit()
+
+
+class SQLiteSink:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                document TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+
+    def write(self, documents):
+        now = time.time()
+        rows = [
+            (id_, json.dumps(document, default=str), now)
+            for id_, document in documents.items()
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)",
+                rows,
+            )
+
+
+class ConversationWriter:
+    def __init__(
+        self,
+        sink,
+        batch_size=50,
+        flush_interval=2.0,
+        max_retries=5,
+        retry_backoff=0.5,
+        max_pending=10000,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_pending = max_pending
+
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()
+        self.writing = False
+        self.closed = False
+        self.stats = {"written": 0, "retries": 0, "failed": 0, "dropped": 0}
+
+        self.thread = threading.Thread(
+            target=self.run,
+            name="conversation-writer",
+            daemon=True,
+        )
+        self.thread.start()
+        atexit.register(self.close)
+
+    def save(self, conversation_id, document):
+        with self.condition:
+            # Each document holds the whole conversation, so a newer one
+            # replaces any queued copy instead of being written after it
+            self.pending.pop(conversation_id, None)
+            self.pending[conversation_id] = document
+            if len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+                self.stats["dropped"] += 1
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+
+    def take_batch(self):
+        with self.condition:
+            if not self.closed and len(self.pending) < self.batch_size:
+                self.condition.wait(self.flush_interval)
+
+            batch = {}
+            while self.pending and len(batch) < self.batch_size:
+                conversation_id, document = self.pending.popitem(last=False)
+                batch[conversation_id] = document
+            self.writing = bool(batch)
+            return batch
+
+    def write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write(batch)
+                self.add_stat("written", len(batch))
+                return
+            except Exception:
+                logger.warning(
+                    "Writing %d conversations failed (attempt %d of %d)",
+                    len(batch),
+                    attempt + 1,
+                    self.max_retries + 1,
+                    exc_info=True,
+                )
+                if attempt == self.max_retries:
+                    break
+                self.add_stat("retries", 1)
+                delay = self.retry_backoff * 2**attempt
+                time.sleep(delay * random.uniform(0.5, 1.5))
+
+        self.add_stat("failed", len(batch))
+
+    def add_stat(self, key, value):
+        with self.condition:
+            self.stats[key] += value
+
+    def run(self):
+        while True:
+            batch = self.take_batch()
+            if batch:
+                self.write(batch)
+
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+                if self.closed and not self.pending:
+                    return
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.condition.notify_all()
+            while self.pending or self.writing:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def get_stats(self):
+        with self.condition:
+            return {**self.stats, "pending": len(self.pending)}
+
+
+def create_conversation_writer(parameters, firebase_certificate=None):
+    backend = parameters["persistence_backend"]
+    if not backend:
+        return None
+
+    if backend == "sqlite":
+        sink = SQLiteSink(parameters["persistence_sqlite_path"])
+    elif backend == "firestore":
+        sink = FirestoreSink(
+            parameters["persistence_collection"],
+            lambda: create_firestore_client(certificate=firebase_certificate),
+        )
+    elif backend == "firestore_emulator":
+        sink = FirestoreSink(
+            parameters["persistence_collection"],
+            lambda: create_firestore_client(
+                emulator_host=parameters["persistence_emulator_host"],
+                project=parameters["persistence_emulator_project"],
+            ),
+        )
+    else:
+        raise ValueError(f"Unknown persistence backend: {backend}")
+
+    return ConversationWriter(
+        sink,
+        batch_size=parameters["persistence_batch_size"],
+        flush_interval=parameters["persistence_flush_interval"],
+        max_retries=parameters["persistence_max_retries"],
+        retry_backoff=parameters["persistence_retry_backoff"],
+        max_pending=parameters["persistence_max_pending"],
+    )
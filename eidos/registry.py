@@ -0,0 +1,105 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+
+import httpx
+import streamlit as st
+
+from eidos.chatbot import ChatbotPipeline
+from eidos.document_manager import DocumentManager
+from eidos.instrumentation import StageMetrics
+from eidos.persistence import create_conversation_writer
+from eidos.web_search import create_web_search
+
+
+def make_key(*values):
+    content = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class PipelineRegistry:
+    def __init__(self, parameters, firebase_certificate=None):
+        self.idle_ttl = parameters["pipeline_idle_ttl"]
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=parameters["http_max_connections"],
+                max_keepalive_connections=parameters["http_max_connections"],
+            ),
+        )
+        self.metrics = StageMetrics(
+            max_samples=parameters["metrics_max_samples"],
+            export_path=parameters["metrics_export_path"],
+        )
+        # Search results and the rate limit are shared by every session
+        self.web_search = create_web_search(parameters, self.http_client)
+        # Conversations from every session are written in shared batches
+        self.conversation_writer = create_conversation_writer(
+            parameters,
+            firebase_certificate=firebase_certificate,
+        )
+
+        self.lock = threading.Lock()
+        self.document_managers = {}
+        self.pipelines = {}
+
+    def get_document_manager(self, configuration):
+        # Retrieval only depends on the parameters, not the selected topic
+        key = make_key(configuration.parameters)
+        if key not in self.document_managers:
+            self.document_managers[key] = DocumentManager(
+                configuration,
+                http_client=self.http_client,
+            )
+        return self.document_managers[key]
+
+    def get_pipeline_key(self, configuration):
+        return make_key(
+            configuration.selected_topic["title"],
+            configuration.selected_language_style["title"],
+            configuration.parameters,
+            configuration.templates,
+            getattr(configuration, "router_lexicon", None),
+        )
+
+    def evict_idle_pipelines(self, now):
+        # Pipelines record their last turn, so one serving live sessions is
+        # kept even when no new session has asked for it
+        for key, pipeline in list(self.pipelines.items()):
+            if now - pipeline.last_used > self.idle_ttl:
+                # The executor is left running because sessions may still
+                # hold the pipeline; its idle workers exit once the last
+                # reference is dropped
+                del self.pipelines[key]
+
+        used = {id(p.document_manager) for p in self.pipelines.values()}
+        for key, document_manager in list(self.document_managers.items()):
+            if id(document_manager) not in used:
+                del self.document_managers[key]
+
+    def get_pipeline(self, configuration):
+        key = self.get_pipeline_key(configuration)
+        with self.lock:
+            self.evict_idle_pipelines(time.monotonic())
+            if key not in self.pipelines:
+                # A copy keeps later selections by the session from leaking
+                configuration = copy.copy(configuration)
+                self.pipelines[key] = ChatbotPipeline(
+                    configuration,
+                    document_manager=self.get_document_manager(configuration),
+                    http_client=self.http_client,
+                    metrics=self.metrics,
+                    web_search=self.web_search,
+                )
+            pipeline = self.pipelines[key]
+            pipeline.touch()
+        return pipeline
+
+
+@st.cache_resource
+def get_pipeline_registry(_configuration):
+    return PipelineRegistry(
+        _configuration.parameters,
+        firebase_certificate=st.secrets.get("firebase"),
+    )
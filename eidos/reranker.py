@@ -0,0 +1,134 @@
+from typing import Any, Callable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr_rerank_batch(
+    query_embeddings,
+    candidate_embeddings,
+    k,
+    lambda_mult=0.5,
+    mask=None,
+):
+    queries = np.asarray(query_embeddings, dtype=np.float32)
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    batch_size, n_candidates, _ = candidates.shape
+    rows = np.arange(batch_size)
+
+    if mask is None:
+        available = np.ones((batch_size, n_candidates), dtype=bool)
+    else:
+        available = np.array(mask, dtype=bool)
+
+    # Cosine similarities are rescaled by norms instead of copying normalized
+    # candidates, which would cost more than the re-ranking itself
+    query_norms = np.maximum(np.linalg.norm(queries, axis=1), 1e-12)
+    candidate_norms = np.sqrt(
+        np.einsum("bnd,bnd->bn", candidates, candidates)
+    )
+    candidate_norms = np.maximum(candidate_norms, 1e-12)
+
+    # One batched matrix multiply scores every candidate against its query
+    relevance = np.matmul(candidates, queries[:, :, None])[:, :, 0]
+    relevance /= candidate_norms * query_norms[:, None]
+    redundancy = np.full((batch_size, n_candidates), -np.inf, np.float32)
+    selected = np.full((batch_size, min(k, n_candidates)), -1, np.int64)
+
+    for step in range(selected.shape[1]):
+        if step == 0:
+            scores = relevance
+        else:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores = np.where(available, scores, -np.inf)
+
+        best = np.argmax(scores, axis=1)
+        valid = available[rows, best]
+        selected[:, step] = np.where(valid, best, -1)
+        available[rows, best] = False
+
+        # Only similarities to the newest pick are needed to update redundancy
+        chosen = candidates[rows, best]
+        similarity = np.matmul(candidates, chosen[:, :, None])[:, :, 0]
+        similarity /= candidate_norms * candidate_norms[rows, best][:, None]
+        redundancy = np.maximum(redundancy, similarity)
+
+    return selected
+
+
+def mmr_rerank(query_embedding, candidate_embeddings, k, lambda_mult=0.5):
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if not len(candidates):
+        return []
+
+    selected = mmr_rerank_batch(
+        np.asarray(query_embedding, dtype=np.float32)[None],
+        candidates[None],
+        k=k,
+        lambda_mult=lambda_mult,
+    )
+    return [int(i) for i in selected[0] if i >= 0]
+
+
+def reciprocal_rank_fusion(rankings, k, constant=60):
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = (document.page_content, document.metadata.get("source"))
+            scores[key] = scores.get(key, 0.0) + 1 / (constant + rank + 1)
+            documents.setdefault(key, document)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+class MMRRetriever(BaseRetriever):
+    embedding: Embeddings
+    search_candidates: Callable[..., Any]
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.retrieve_batch([query])[0]
+
+    def retrieve_batch(self, queries):
+        query_embeddings = self.embedding.embed_documents(queries)
+        results = [
+            self.search_candidates(embedding, self.fetch_k)
+            for embedding in query_embeddings
+        ]
+
+        width = max((len(documents) for documents, _ in results), default=0)
+        if not width:
+            return [[] for _ in queries]
+
+        dimensions = len(query_embeddings[0])
+        candidates = np.zeros((len(queries), width, dimensions), np.float32)
+        mask = np.zeros((len(queries), width), dtype=bool)
+        for i, (documents, vectors) in enumerate(results):
+            if documents:
+                candidates[i, : len(documents)] = vectors
+                mask[i, : len(documents)] = True
+
+        selected = mmr_rerank_batch(
+            np.asarray(query_embeddings, dtype=np.float32),
+            candidates,
+            k=self.k,
+            lambda_mult=self.lambda_mult,
+            mask=mask,
+        )
+        return [
+            [documents[i] for i in indices if i >= 0]
+            for (documents, _), indices in zip(results, selected)
+        ]
@@ -58,3 +58,37 @@ class WebSearchQueriesModel(BaseModel):
         description="List of web search queries.",
         default=[],
     )
+
+
+class FusedTurnModel(BaseModel):
+    """Model for the quality, question and reply of a single turn."""
+
+    classification: Literal[
+        "consistent",
+        "inconsistent",
+    ] = Field(
+        description="Whether the statement is consistent or inconsistent.",
+        default="consistent",
+    )
+    type: Literal[
+        "fallacy",
+        "external contradiction with philosophical texts",
+        "external contradiction with previous statements",
+        "internal contradiction within the statement",
+        "unsupported claim",
+    ] = Field(
+        description="Type of inconsistency in the statement, if any.",
+        default="",
+    )
+    explanation: str = Field(
+        description="Explanation for the classification of the statement.",
+        default="",
+    )
+    question: str = Field(
+        description="Socratic question to ask about the statement.",
+        default="",
+    )
+    answer: str = Field(
+        description="Reply that explains the quality and asks the question.",
+        default="",
+    )
@@ -0,0 +1,165 @@
+import json
+import os
+import random
+import re
+import threading
+
+from langchain_core.runnables import RunnableLambda
+
+from eidos.response_models import RouteModel
+
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def tokenize(text):
+    # Possessives match their lexicon entry, so "hume's" counts as "hume"
+    text = text.lower().replace("\u2019", "'")
+    return [word.removesuffix("'s") for word in WORD_PATTERN.findall(text)]
+
+
+class LexiconRouter:
+    def __init__(
+        self,
+        philosophers,
+        keywords,
+        vectorstore_threshold,
+        llm_threshold,
+        shadow_rate,
+        executor,
+        log_path=None,
+    ):
+        self.philosophers = self.compile_lexicon(philosophers)
+        self.keywords = self.compile_lexicon(keywords)
+        self.vectorstore_threshold = vectorstore_threshold
+        self.llm_threshold = llm_threshold
+        self.shadow_rate = shadow_rate
+        self.executor = executor
+        self.log_path = log_path
+
+        self.lock = threading.Lock()
+        self.counts = {
+            "local": 0,
+            "fallback": 0,
+            "shadow_compared": 0,
+            "shadow_agreed": 0,
+            "fallback_lean_agreed": 0,
+        }
+
+    def compile_lexicon(self, entries):
+        words, phrases = set(), []
+        for entry in entries:
+            entry = " ".join(tokenize(entry))
+            if " " in entry:
+                phrases.append(f" {entry} ")
+            else:
+                words.add(entry)
+        return words, phrases
+
+    def count_matches(self, lexicon, words, text):
+        lexicon_words, lexicon_phrases = lexicon
+        count = sum(1 for word in words if word in lexicon_words)
+        count += sum(1 for phrase in lexicon_phrases if phrase in text)
+        return count
+
+    def score(self, message):
+        words = tokenize(message)
+        text = f" {' '.join(words)} "
+
+        score = 2 * self.count_matches(self.philosophers, words, text)
+        score += self.count_matches(self.keywords, words, text)
+        if any(len(word) > 5 and word.endswith("ism") for word in words):
+            score += 1
+        if message.strip().endswith("?"):
+            score -= 1
+        if len(words) < 5:
+            score -= 1
+        return score
+
+    def decide(self, score):
+        if score >= self.vectorstore_threshold:
+            return "vectorstore"
+        if score <= self.llm_threshold:
+            return "llm"
+        return None
+
+    def count(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.counts[key] += 1
+
+    def log_decision(self, score, decision, weight):
+        # Every LLM decision is logged with its score, so the thresholds can
+        # be calibrated against the LLM router by scripts/calibrate_router.py.
+        # Shadow checks only sample local routes, so they carry a weight
+        if not self.log_path:
+            return
+
+        entry = {"score": score, "decision": decision, "weight": weight}
+        with self.lock:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+
+    def shadow(self, chain, inputs, score, decision):
+        route = chain.invoke(inputs)
+        self.log_decision(score, route.decision, 1 / self.shadow_rate)
+        if route.decision == decision:
+            self.count("shadow_compared", "shadow_agreed")
+        else:
+            self.count("shadow_compared")
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+
+        routed = stats["local"] + stats["fallback"]
+        compared = stats["shadow_compared"]
+        stats["local_rate"] = stats["local"] / routed if routed else 0.0
+        stats["shadow_agreement"] = (
+            stats["shadow_agreed"] / compared if compared else 0.0
+        )
+        stats["fallback_lean_agreement"] = (
+            stats["fallback_lean_agreed"] / stats["fallback"]
+            if stats["fallback"]
+            else 0.0
+        )
+        return stats
+
+    def wrap(self, chain, shadow_chain=None, input_key="user_message"):
+        # Shadow checks need a fresh LLM decision, so they skip any cache
+        # wrapped around the chain
+        shadow_chain = shadow_chain or chain
+
+        def invoke(inputs, config):
+            score = self.score(inputs[input_key])
+            decision = self.decide(score)
+            if decision is None:
+                # Unsure messages go to the LLM, which also grades the lean
+                # of the score so the thresholds can be tuned
+                route = chain.invoke(inputs, config)
+                self.log_decision(score, route.decision, 1.0)
+                lean = "vectorstore" if score > 0 else "llm"
+                if route.decision == lean:
+                    self.count("fallback", "fallback_lean_agreed")
+                else:
+                    self.count("fallback")
+                return route
+
+            self.count("local")
+            if random.random() < self.shadow_rate:
+                self.executor.submit(
+                    self.shadow,
+                    shadow_chain,
+                    inputs,
+                    score,
+                    decision,
+                )
+
+            return RouteModel(
+                explanation=f"Local lexicon router scored the message {score}.",
+                decision=decision,
+            )
+
+        return RunnableLambda(invoke)
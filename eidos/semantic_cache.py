@@ -0,0 +1,98 @@
+import threading
+import time
+
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+
+from eidos.reranker import normalize
+
+
+class SemanticCache:
+    def __init__(self, embedding, threshold, ttl, max_entries, on_hit=None):
+        self.embedding = embedding
+        self.on_hit = on_hit
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.values = [None] * max_entries
+        self.created_at = np.zeros(max_entries)
+        self.used_at = np.zeros(max_entries)
+        self.occupied = np.zeros(max_entries, dtype=bool)
+        self.hits = 0
+        self.misses = 0
+
+    def expire(self, now):
+        expired = self.occupied & (self.created_at < now - self.ttl)
+        self.occupied[expired] = False
+        for slot in np.flatnonzero(expired):
+            self.values[slot] = None
+
+    def lookup(self, vector):
+        now = time.time()
+        with self.lock:
+            self.expire(now)
+            if not self.occupied.any():
+                self.misses += 1
+                return None
+
+            similarities = np.where(
+                self.occupied,
+                self.vectors @ vector,
+                -np.inf,
+            )
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.used_at[best] = now
+            self.hits += 1
+            return self.values[best]
+
+    def store(self, vector, value):
+        now = time.time()
+        with self.lock:
+            if self.vectors is None:
+                shape = (self.max_entries, len(vector))
+                self.vectors = np.zeros(shape, dtype=np.float32)
+
+            # Reuse a free slot, otherwise evict the least recently used entry
+            free = np.flatnonzero(~self.occupied)
+            if len(free):
+                slot = free[0]
+            else:
+                slot = int(np.argmin(self.used_at))
+
+            self.vectors[slot] = vector
+            self.values[slot] = value
+            self.created_at[slot] = now
+            self.used_at[slot] = now
+            self.occupied[slot] = True
+
+    def get_stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": int(self.occupied.sum()),
+            }
+
+    def wrap(self, chain, input_key="user_message"):
+        def invoke(inputs, config):
+            vector = normalize(self.embedding.embed_query(inputs[input_key]))
+            cached = self.lookup(vector)
+            if cached is not None:
+                if self.on_hit:
+                    self.on_hit()
+                return cached
+
+            result = chain.invoke(inputs, config)
+            self.store(vector, result)
+            return result
+
+        return RunnableLambda(invoke)
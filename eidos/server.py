@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from eidos.configuration import (
+    Configuration,
+    EnvironmentSecrets,
+    TomlSecrets,
+)
+from eidos.engine import (
+    ChatbotEngine,
+    ConversationEndedError,
+    SessionNotFoundError,
+)
+
+ENGINE_KEY = web.AppKey("engine", ChatbotEngine)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+
+
+async def run_blocking(request, function, *args, **kwargs):
+    # The pipeline is synchronous, so it runs on the worker pool
+    loop = asyncio.get_running_loop()
+    call = functools.partial(function, *args, **kwargs)
+    return await loop.run_in_executor(request.app[EXECUTOR_KEY], call)
+
+
+def get_session_id(request):
+    return request.match_info["session_id"]
+
+
+async def read_body(request):
+    # Malformed bodies are client errors, not server failures
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="The request body must be valid JSON.")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="The request body must be an object.")
+    return body
+
+
+async def create_session(request):
+    body = await read_body(request)
+    try:
+        session = await run_blocking(
+            request,
+            request.app[ENGINE_KEY].create_session,
+            body["topic"],
+            body["language_style"],
+        )
+    except (KeyError, ValueError) as error:
+        raise web.HTTPBadRequest(text=str(error))
+
+    return web.json_response(
+        {"session_id": session.id, "messages": session.get_messages()},
+        status=201,
+    )
+
+
+async def get_session(request):
+    session = request.app[ENGINE_KEY].get_session(get_session_id(request))
+    return web.json_response(
+        {"session_id": session.id, "messages": session.get_messages()}
+    )
+
+
+async def send_message(request):
+    body = await read_body(request)
+    if not isinstance(body.get("message"), str) or not body["message"]:
+        raise web.HTTPBadRequest(text="A non-empty message is required.")
+
+    progress = []
+    try:
+        response = await run_blocking(
+            request,
+            request.app[ENGINE_KEY].send_message,
+            get_session_id(request),
+            body["message"],
+            progress=progress.append,
+        )
+    except ConversationEndedError:
+        raise web.HTTPConflict(text="The conversation has ended.")
+
+    return web.json_response({**response, "progress": progress})
+
+
+async def wrap_up(request):
+    progress = []
+    result = await run_blocking(
+        request,
+        request.app[ENGINE_KEY].wrap_up,
+        get_session_id(request),
+        progress=progress.append,
+    )
+    return web.json_response({**result, "progress": progress})
+
+
+@web.middleware
+async def handle_missing_sessions(request, handler):
+    try:
+        return await handler(request)
+    except SessionNotFoundError:
+        raise web.HTTPNotFound(text="Session not found.")
+
+
+def create_app(engine):
+    app = web.Application(middlewares=[handle_missing_sessions])
+    app[ENGINE_KEY] = engine
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(
+        max_workers=engine.config.parameters["server_workers"],
+    )
+
+    async def shutdown_executor(app):
+        app[EXECUTOR_KEY].shutdown(wait=False)
+
+    app.on_cleanup.append(shutdown_executor)
+    app.add_routes(
+        [
+            web.post("/sessions", create_session),
+            web.get("/sessions/{session_id}", get_session),
+            web.post("/sessions/{session_id}/messages", send_message),
+            web.post("/sessions/{session_id}/wrap-up", wrap_up),
+        ]
+    )
+    return app
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Serve the chatbot engine over HTTP."
+    )
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--secrets",
+        type=str,
+        default=None,
+        help="Path to a secrets TOML file. Uses the environment if omitted.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.secrets:
+        secrets = TomlSecrets(args.secrets)
+    else:
+        secrets = EnvironmentSecrets()
+
+    engine = ChatbotEngine(Configuration(secrets=secrets))
+    web.run_app(create_app(engine), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import json
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+class MessageRecord:
+    __slots__ = ("type", "message", "context", "stage_timings")
+
+    def __init__(self, type, message, context=None, stage_timings=None):
+        self.type = type
+        self.message = message
+        self.context = context
+        self.stage_timings = stage_timings
+
+    def to_langchain(self):
+        if self.type == "human":
+            return HumanMessage(self.message)
+        return AIMessage(self.message)
+
+    def to_content(self):
+        content = {"message": self.message}
+        if self.type == "ai":
+            content["context"] = self.context
+        if self.stage_timings is not None:
+            content["stage_timings"] = self.stage_timings
+        return content
+
+    def to_dict(self):
+        # Same layout as the stored conversations read by the export scripts
+        return {"type": self.type, "content": json.dumps(self.to_content())}
+
+    @classmethod
+    def from_dict(cls, data):
+        content = json.loads(data["content"])
+        return cls(
+            data["type"],
+            content["message"],
+            context=content.get("context"),
+            stage_timings=content.get("stage_timings"),
+        )
+
+
+class SessionHistory:
+    def __init__(self, records=None):
+        self.records = list(records or [])
+        self.lock = threading.Lock()
+        self.langchain_messages = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def add_user_message(self, message):
+        self.records.append(MessageRecord("human", message))
+
+    def add_ai_message(self, message, context=None, stage_timings=None):
+        self.records.append(
+            MessageRecord("ai", message, context, stage_timings)
+        )
+
+    def get_langchain_messages(self):
+        # Records are append-only, so only new ones need converting
+        with self.lock:
+            converted = len(self.langchain_messages)
+            self.langchain_messages.extend(
+                record.to_langchain() for record in self.records[converted:]
+            )
+            return list(self.langchain_messages)
+
+    def to_dicts(self):
+        return [record.to_dict() for record in self.records]
+
+    @classmethod
+    def from_dicts(cls, data):
+        return cls(MessageRecord.from_dict(item) for item in data)
@@ -0,0 +1,43 @@
+import time
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class StageTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}
+
+    def record(self, stage, duration):
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+
+    def run(self, stage, function, *args, **kwargs):
+        result, duration = timed(function, *args, **kwargs)
+        self.record(stage, duration)
+        return result
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def sequential(self):
+        return sum(self.durations.values())
+
+    @property
+    def saved(self):
+        return max(self.sequential - self.elapsed, 0.0)
+
+    def format_report(self):
+        stages = ", ".join(
+            f"{stage} {duration:.2f}s"
+            for stage, duration in self.durations.items()
+        )
+        return (
+            f"Finished in {self.elapsed:.2f}s instead of"
+            f" {self.sequential:.2f}s, saving {self.saved:.2f}s ({stages})."
+        )
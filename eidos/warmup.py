@@ -0,0 +1,117 @@
+import glob
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+from langchain_core.documents import Document
+
+from eidos.ingestion import hash_file
+from eidos.reranker import normalize
+
+
+def get_corpus_version(parameters):
+    # Ingestion rewrites the manifest whenever the corpus changes, so its
+    # hash tells warmup files built from an older corpus apart
+    manifest_path = parameters["ingestion_manifest_path"]
+    if not os.path.exists(manifest_path):
+        return "unversioned"
+    return hash_file(manifest_path)[:16]
+
+
+def get_warmup_prefix(parameters, topic):
+    slug = re.sub(r"[^a-z0-9]+", "_", topic["title"].lower()).strip("_")
+    model = parameters["embedding_model"]
+    dimensions = parameters["embedding_dimensions"]
+    filename = f"{slug}-{model}-{dimensions}-"
+    return os.path.join(parameters["warmup_path"], filename)
+
+
+def get_warmup_path(parameters, topic):
+    prefix = get_warmup_prefix(parameters, topic)
+    return f"{prefix}{get_corpus_version(parameters)}.npz"
+
+
+def remove_stale_warmup_files(parameters, topic, path):
+    prefix = get_warmup_prefix(parameters, topic)
+    for stale_path in glob.glob(f"{glob.escape(prefix)}*.npz"):
+        version = stale_path[len(prefix) : -len(".npz")]
+        if stale_path != path and "-" not in version:
+            os.remove(stale_path)
+
+
+class WarmupIndex:
+    def __init__(self, documents, vectors):
+        self.documents = documents
+        self.vectors = normalize(np.asarray(vectors, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search_candidates(self, embedding, fetch_k):
+        scores = self.vectors @ normalize(embedding)
+        k = min(fetch_k, len(scores))
+        if k <= 0:
+            return [], self.vectors[:0]
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.documents[i] for i in top], self.vectors[top]
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        documents = [
+            {"text": d.page_content, "metadata": d.metadata}
+            for d in self.documents
+        ]
+        # Pipelines of the same topic may build it together, so each writes
+        # its own temporary file and the last replace wins
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=directory or None,
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(
+                    file,
+                    vectors=self.vectors,
+                    documents=np.asarray(json.dumps(documents)),
+                )
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            documents = [
+                Document(page_content=d["text"], metadata=d["metadata"])
+                for d in json.loads(str(data["documents"]))
+            ]
+        return cls(documents, vectors)
+
+
+def build_warmup_index(document_manager, seed_statements, fetch_k):
+    # Candidates of every seed statement are pooled and deduplicated
+    embeddings = document_manager.embedding_model.embed_documents(
+        seed_statements
+    )
+    documents, vectors = {}, {}
+    for embedding in embeddings:
+        candidates, candidate_vectors = document_manager.search_candidates(
+            embedding,
+            fetch_k,
+        )
+        for document, vector in zip(candidates, candidate_vectors):
+            key = (document.page_content, document.metadata.get("source"))
+            documents.setdefault(key, document)
+            vectors.setdefault(key, vector)
+
+    return WarmupIndex(list(documents.values()), list(vectors.values()))
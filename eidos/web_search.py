@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    path = parts.path.rstrip("/")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{path}{query}"
+
+
+def normalize_title(title):
+    return re.sub(r"\W+", " ", title.casefold()).strip()
+
+
+def make_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RateLimiter:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.updated_at
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + elapsed * self.rate,
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SearchResultCache:
+    def __init__(self, path, ttl):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS search_results (
+                key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT results FROM search_results"
+                " WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, results):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?)",
+                (key, json.dumps(results), time.time()),
+            )
+            self.connection.execute(
+                "DELETE FROM search_results WHERE created_at < ?",
+                (time.time() - self.ttl,),
+            )
+            self.connection.commit()
+
+
+class GoogleSearchBackend:
+    def __init__(self, http_client=None):
+        # One pooled client serves every query instead of a new API wrapper
+        self.http_client = http_client or httpx.Client()
+        self.api_key = os.getenv("GOOGLE_API_KEY")
+        self.cse_id = os.getenv("GOOGLE_CSE_ID")
+
+    def search(self, query, num_results):
+        response = self.http_client.get(
+            GOOGLE_SEARCH_URL,
+            params={
+                "key": self.api_key,
+                "cx": self.cse_id,
+                "q": query,
+                "num": num_results,
+            },
+        )
+        response.raise_for_status()
+        return [
+            {
+                "title": item["title"],
+                "link": item["link"],
+                "snippet": item.get("snippet", ""),
+            }
+            for item in response.json().get("items", [])
+        ]
+
+
+class WebSearch:
+    def __init__(
+        self,
+        backend,
+        cache,
+        rate_limiter,
+        max_workers,
+        results_per_query,
+    ):
+        self.backend = backend
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.results_per_query = results_per_query
+
+    def search(self, query):
+        key = make_key(f"{self.results_per_query}\0{query.strip().lower()}")
+        if self.cache:
+            results = self.cache.get(key)
+            if results is not None:
+                return results
+
+        self.rate_limiter.acquire()
+        results = self.backend.search(query, self.results_per_query)
+        if self.cache:
+            self.cache.set(key, results)
+        return results
+
+    def search_many(self, queries):
+        return list(self.executor.map(self.search, queries))
+
+    def dedupe(self, results, format_title=None):
+        readings = []
+        seen = set()
+        for result in results:
+            title = result["title"]
+            if format_title:
+                title = format_title(title)
+
+            keys = {
+                make_key(f"url\0{normalize_url(result['link'])}"),
+                make_key(f"title\0{normalize_title(title)}"),
+            }
+            if keys & seen:
+                continue
+
+            seen |= keys
+            readings.append({**result, "title": title})
+        return readings
+
+
+def create_web_search(parameters, http_client=None):
+    backend_name = parameters["web_search_backend"]
+    if backend_name == "google":
+        backend = GoogleSearchBackend(http_client)
+    elif backend_name == "fake":
+        # Only offline benchmarks use the fake, so production never loads it
+        from eidos.fakes import FakeSearchBackend
+
+        backend = FakeSearchBackend()
+    else:
+        raise ValueError(f"Unknown web search backend: {backend_name}")
+
+    cache = None
+    if parameters["web_search_cache_path"]:
+        cache = SearchResultCache(
+            parameters["web_search_cache_path"],
+            ttl=parameters["web_search_cache_ttl"],
+        )
+
+    return WebSearch(
+        backend,
+        cache,
+        RateLimiter(
+            rate=parameters["web_search_rate"],
+            capacity=parameters["web_search_burst"],
+        ),
+        max_workers=parameters["web_search_workers"],
+        results_per_query=parameters["web_search_results_per_query"],
+    )
@@ -1,5 +1,6 @@
 import streamlit as st
 from eidos.chatbot import ChatbotAgent
+from eidos.registry import get_pipeline_registry
 from helpers import page_utils
 
 
@@ -17,7 +18,13 @@ class ChatPage:
 
     def run_chatbot(self):
         if not self.state.chatbot:
-            self.state.chatbot = ChatbotAgent(self.state.config)
+            registry = get_pipeline_registry(self.state.config)
+            pipeline = registry.get_pipeline(self.state.config)
+            self.state.chatbot = ChatbotAgent(
+                self.state.config,
+                pipeline,
+                conversation_writer=registry.conversation_writer,
+            )
         self.state.chatbot.run()
 
     def run(self):
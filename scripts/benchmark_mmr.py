@@ -0,0 +1,134 @@
+"""
+This module benchmarks the vectorized MMR re-ranker against the reference
+implementation used by the LangChain vector store integrations.
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+from eidos.reranker import mmr_rerank, mmr_rerank_batch
+
+
+def measure(function: Callable[[], object], repeats: int) -> float:
+    """Return the median wall time of a function call in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def make_candidates(
+    generator: np.random.Generator,
+    batch_size: int,
+    fetch_k: int,
+    dimensions: int,
+) -> np.ndarray:
+    """Generate random candidate embeddings for a batch of queries."""
+    shape = (batch_size, fetch_k, dimensions)
+    return generator.standard_normal(shape).astype(np.float32)
+
+
+def run_benchmark(
+    fetch_ks: List[int],
+    k: int,
+    dimensions: int,
+    batch_size: int,
+    repeats: int,
+) -> None:
+    """Print re-ranking latency for each candidate pool size."""
+    generator = np.random.default_rng(0)
+    print(
+        f"{'fetch_k':>8} {'reference ms':>14} {'vectorized ms':>15}"
+        f" {'batch of ' + str(batch_size) + ' ms':>16} {'match':>6}"
+    )
+
+    for fetch_k in fetch_ks:
+        candidates = make_candidates(generator, batch_size, fetch_k, dimensions)
+        queries = generator.standard_normal((batch_size, dimensions))
+        queries = queries.astype(np.float32)
+
+        reference = maximal_marginal_relevance(
+            queries[0], candidates[0], k=k
+        )
+        vectorized = mmr_rerank(queries[0], candidates[0], k=k)
+
+        reference_ms = measure(
+            lambda: maximal_marginal_relevance(
+                queries[0], candidates[0], k=k
+            ),
+            repeats,
+        )
+        vectorized_ms = measure(
+            lambda: mmr_rerank(queries[0], candidates[0], k=k),
+            repeats,
+        )
+        batch_ms = measure(
+            lambda: mmr_rerank_batch(queries, candidates, k=k),
+            repeats,
+        )
+        print(
+            f"{fetch_k:>8} {reference_ms:>14.3f} {vectorized_ms:>15.3f}"
+            f" {batch_ms:>16.3f} {str(reference == vectorized):>6}"
+        )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark MMR re-ranking over large candidate pools."
+    )
+
+    parser.add_argument(
+        "--fetch-k",
+        type=int,
+        nargs="+",
+        default=[50, 500, 1000, 2000, 5000],
+        help="Candidate pool sizes to benchmark.",
+    )
+    parser.add_argument(
+        "--k",
+        type=int,
+        default=2,
+        help="Number of documents to keep after re-ranking.",
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=1536,
+        help="Embedding dimensions.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Number of queries re-ranked in one batched call.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=20,
+        help="Number of timed runs per measurement.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    run_benchmark(
+        args.fetch_k,
+        args.k,
+        args.dimensions,
+        args.batch_size,
+        args.repeats,
+    )
+
+
+if __name__ == "__main__":
+    main()
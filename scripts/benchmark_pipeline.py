@@ -0,0 +1,339 @@
+"""
+This module replays scripted dialogues through the chatbot pipeline with
+fake language models, fake embeddings and the local vector store, so its
+performance can be measured without OpenAI or Pinecone credentials.
+"""
+
+import argparse
+import copy
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+import yaml
+from langchain_core.documents import Document
+
+from eidos.chatbot import ChatbotPipeline
+from eidos.configuration import Configuration, EnvironmentSecrets
+from eidos.document_manager import DocumentManager
+from eidos.fakes import FakeChatModel, FakeEmbeddings, make_words
+from eidos.session_history import SessionHistory
+
+
+class OfflineDocumentManager(DocumentManager):
+    """Document manager backed by fake embeddings."""
+
+    def __init__(self, configuration: Configuration, latency: float):
+        self.latency = latency
+        super().__init__(configuration)
+
+    def initialize_embedding_model(self) -> FakeEmbeddings:
+        return FakeEmbeddings(
+            dimensions=self.config.parameters["embedding_dimensions"],
+            latency=self.latency,
+        )
+
+
+class OfflinePipeline(ChatbotPipeline):
+    """Chatbot pipeline backed by fake chat models."""
+
+    def __init__(
+        self,
+        configuration: Configuration,
+        document_manager: DocumentManager,
+        llm_options: Dict[str, Dict[str, float]],
+    ):
+        self.llm_options = llm_options
+        super().__init__(configuration, document_manager)
+
+    def create_llm(self, role: str) -> FakeChatModel:
+        return FakeChatModel(
+            cache=self.completion_cache,
+            **self.llm_options[role],
+        )
+
+
+def load_configuration(
+    args: argparse.Namespace,
+    index_path: str,
+) -> Configuration:
+    """Load the configuration and point it at offline backends."""
+    config = Configuration(secrets=EnvironmentSecrets())
+    config.parameters.update(
+        {
+            "vectorstore_backend": "local",
+            "local_index_path": index_path,
+            "lexical_index_path": os.path.join(index_path, "lexical"),
+            "warmup_path": os.path.join(index_path, "warmup"),
+            "embedding_cache_path": "",
+            "web_search_backend": "fake",
+            "web_search_cache_path": "",
+            "metrics_export_path": None,
+            "router_log_path": None,
+            "parallel_stages": not args.sequential,
+            "history_token_budget": args.history_token_budget,
+        }
+    )
+    return config
+
+
+def seed_corpus(document_manager: DocumentManager, size: int) -> None:
+    """Fill the local vector store with synthetic chunks."""
+    texts = [" ".join(make_words(seed, 150)) for seed in range(size)]
+    ids = [str(seed) for seed in range(size)]
+    document_manager.vectorstore.add_texts(texts, ids=ids)
+
+    lexical_index = document_manager.lexical_index
+    if lexical_index:
+        documents = [Document(page_content=text) for text in texts]
+        lexical_index.add_documents(documents, ids)
+        lexical_index.save()
+
+
+def replay_dialogue(
+    pipeline: ChatbotPipeline,
+    dialogue: Dict[str, Any],
+) -> Dict[str, List[float]]:
+    """Replay one dialogue and return the latency of every call."""
+    latencies = {
+        "turn": [],
+        "summary": [],
+        "belief_advices": [],
+        "suggested_readings": [],
+    }
+    history = SessionHistory()
+    history.add_ai_message("Greeting")
+
+    for user_message in dialogue["turns"]:
+        start = time.perf_counter()
+        response = pipeline.get_response(user_message, history)
+        latencies["turn"].append(time.perf_counter() - start)
+
+        history.add_user_message(user_message)
+        history.add_ai_message(response["message"], response["context"])
+
+    start = time.perf_counter()
+    pipeline.get_summary(history)
+    latencies["summary"].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pipeline.get_belief_advices(history)
+    latencies["belief_advices"].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pipeline.get_suggested_readings(history)
+    latencies["suggested_readings"].append(time.perf_counter() - start)
+
+    return latencies
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Return count, p50 and p95 of a list of latencies in seconds."""
+    values = np.asarray(latencies or [0.0])
+    return {
+        "count": len(latencies),
+        "p50_seconds": float(np.percentile(values, 50)),
+        "p95_seconds": float(np.percentile(values, 95)),
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Replay every dialogue and collect throughput, latency and memory."""
+    with open(args.dialogues, "r", encoding="utf-8") as file:
+        dialogues = yaml.safe_load(file) * args.repeat
+
+    llm_options = {
+        "main": {
+            "latency": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+        },
+        "helper": {
+            "latency": args.helper_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+        },
+    }
+
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as index_path:
+        config = load_configuration(args, index_path)
+        document_manager = OfflineDocumentManager(
+            config,
+            args.embedding_latency,
+        )
+        seed_corpus(document_manager, args.corpus_size)
+
+        pipelines = {}
+        for dialogue in dialogues:
+            key = (dialogue["topic"], dialogue["language_style"])
+            if key not in pipelines:
+                selected_config = copy.copy(config)
+                selected_config.select(*key)
+                pipelines[key] = OfflinePipeline(
+                    selected_config,
+                    document_manager,
+                    llm_options,
+                )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(
+                executor.map(
+                    lambda dialogue: replay_dialogue(
+                        pipelines[
+                            (dialogue["topic"], dialogue["language_style"])
+                        ],
+                        dialogue,
+                    ),
+                    dialogues,
+                )
+            )
+        elapsed = time.perf_counter() - start
+
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = {}
+    for result in results:
+        for name, latencies in result.items():
+            calls.setdefault(name, []).extend(latencies)
+
+    stages = {}
+    for pipeline in pipelines.values():
+        for stage, durations in pipeline.metrics.durations.items():
+            stages.setdefault(stage, []).extend(durations)
+
+    turns = len(calls["turn"])
+    return {
+        "dialogues": len(dialogues),
+        "turns": turns,
+        "elapsed_seconds": elapsed,
+        "turns_per_second": turns / elapsed,
+        "calls": {k: summarize_latencies(v) for k, v in calls.items()},
+        "stages": {k: summarize_latencies(v) for k, v in stages.items()},
+        "peak_traced_memory_mb": peak_memory / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / 2**10,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a readable summary of the benchmark report."""
+    print(
+        f"{report['dialogues']} dialogues, {report['turns']} turns in"
+        f" {report['elapsed_seconds']:.2f}s"
+        f" ({report['turns_per_second']:.2f} turns/s)"
+    )
+    print(
+        f"Peak traced memory {report['peak_traced_memory_mb']:.1f} MB,"
+        f" max RSS {report['max_rss_mb']:.1f} MB"
+    )
+    for section in ("calls", "stages"):
+        print(f"\n{section.title():<20} {'count':>6} {'p50 s':>8} {'p95 s':>8}")
+        for name, values in report[section].items():
+            print(
+                f"{name:<20} {values['count']:>6}"
+                f" {values['p50_seconds']:>8.3f} {values['p95_seconds']:>8.3f}"
+            )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the chatbot pipeline offline."
+    )
+
+    parser.add_argument(
+        "--dialogues",
+        type=str,
+        default="scripts/benchmark_dialogues.yaml",
+        help="Path to the scripted dialogues.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of times to replay the dialogues.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of dialogues replayed at the same time.",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.5,
+        help="Seconds before the main model starts answering.",
+    )
+    parser.add_argument(
+        "--helper-latency",
+        type=float,
+        default=0.2,
+        help="Seconds before the helper model starts answering.",
+    )
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=100.0,
+        help="Generation speed of the fake models.",
+    )
+    parser.add_argument(
+        "--completion-tokens",
+        type=int,
+        default=40,
+        help="Number of tokens generated per completion.",
+    )
+    parser.add_argument(
+        "--embedding-latency",
+        type=float,
+        default=0.05,
+        help="Seconds per embedding request.",
+    )
+    parser.add_argument(
+        "--corpus-size",
+        type=int,
+        default=1000,
+        help="Number of synthetic chunks in the local vector store.",
+    )
+    parser.add_argument(
+        "--history-token-budget",
+        type=int,
+        default=None,
+        help="Token budget before old turns are summarized.",
+    )
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Disable parallel execution of independent stages.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Optional path to write the report as JSON.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
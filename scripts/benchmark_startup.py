@@ -0,0 +1,282 @@
+"""
+This module measures cold start: how long a fresh interpreter takes to
+import the chatbot, load the configuration, build a pipeline and answer its
+first turn, using fake language models and the local vector store. Each run
+uses a new process, so module and client caches start empty every time.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+PHASES = ("import", "configuration", "pipeline", "first_turn")
+
+
+def measure_startup(args: argparse.Namespace) -> Dict[str, float]:
+    """Time every startup phase inside the current, fresh process."""
+    start = time.perf_counter()
+    import eidos.chatbot  # noqa: F401
+
+    timings = {"import": time.perf_counter() - start}
+
+    from eidos.session_history import SessionHistory
+    from scripts.benchmark_pipeline import (
+        OfflineDocumentManager,
+        OfflinePipeline,
+        load_configuration,
+        seed_corpus,
+    )
+
+    llm_options = {
+        role: {
+            "latency": args.llm_latency,
+            "tokens_per_second": 1e9,
+            "completion_tokens": 40,
+        }
+        for role in ("main", "helper")
+    }
+
+    with tempfile.TemporaryDirectory() as index_path:
+        start = time.perf_counter()
+        config = load_configuration(
+            argparse.Namespace(sequential=False, history_token_budget=None),
+            index_path,
+        )
+        config.select(args.topic, args.language_style)
+        timings["configuration"] = time.perf_counter() - start
+
+        # The corpus is setup, not startup, so it is seeded outside the timer
+        document_manager = OfflineDocumentManager(config, latency=0.0)
+        seed_corpus(document_manager, args.corpus_size)
+
+        start = time.perf_counter()
+        pipeline = OfflinePipeline(config, document_manager, llm_options)
+        timings["pipeline"] = time.perf_counter() - start
+
+        history = SessionHistory()
+        history.add_ai_message(pipeline.get_greeting())
+        start = time.perf_counter()
+        pipeline.get_response(args.message, history)
+        timings["first_turn"] = time.perf_counter() - start
+        pipeline.executor.shutdown()
+
+    return timings
+
+
+def run_child(args: argparse.Namespace) -> Dict[str, float]:
+    """Run one measurement in a new interpreter and return its timings."""
+    command = [
+        sys.executable,
+        "-m",
+        "scripts.benchmark_startup",
+        "--child",
+        "--topic",
+        args.topic,
+        "--language-style",
+        args.language_style,
+        "--message",
+        args.message,
+        "--corpus-size",
+        str(args.corpus_size),
+        "--llm-latency",
+        str(args.llm_latency),
+    ]
+    output = subprocess.run(
+        command,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def profile_imports(module: str, top: int) -> List[Dict[str, Any]]:
+    """Return the modules with the highest self import time."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        imports.append(
+            {
+                "module": name.strip(),
+                "self_seconds": int(self_time) / 1e6,
+                "cumulative_seconds": int(cumulative) / 1e6,
+            }
+        )
+    imports.sort(key=lambda item: item["self_seconds"], reverse=True)
+    return imports[:top]
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Measure every phase over several fresh processes."""
+    runs = [run_child(args) for _ in range(args.runs)]
+
+    phases = {}
+    for phase in (*PHASES, "total"):
+        if phase == "total":
+            values = [sum(run[p] for p in PHASES) for run in runs]
+        else:
+            values = [run[phase] for run in runs]
+        phases[phase] = {
+            "p50_seconds": float(np.percentile(values, 50)),
+            "max_seconds": float(np.max(values)),
+        }
+
+    return {
+        "runs": args.runs,
+        "phases": phases,
+        "slowest_imports": profile_imports("eidos.chatbot", args.top_imports),
+    }
+
+
+def compare_with_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> List[str]:
+    """List the phases whose median regressed beyond the tolerance."""
+    regressions = []
+    for phase, values in report["phases"].items():
+        if phase not in baseline["phases"]:
+            continue
+        previous = baseline["phases"][phase]["p50_seconds"]
+        current = values["p50_seconds"]
+        if current > previous * (1 + tolerance):
+            regressions.append(
+                f"{phase}: {current:.3f} s, baseline {previous:.3f} s"
+                f" (+{current / previous - 1:.0%})"
+            )
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the phase timings and the slowest imports."""
+    print(f"{report['runs']} fresh processes\n")
+    print(f"{'Phase':<14} {'p50 s':>8} {'max s':>8}")
+    for phase, values in report["phases"].items():
+        print(
+            f"{phase:<14} {values['p50_seconds']:>8.3f}"
+            f" {values['max_seconds']:>8.3f}"
+        )
+
+    print(f"\n{'Slowest imports':<50} {'self s':>8} {'cumul s':>8}")
+    for item in report["slowest_imports"]:
+        print(
+            f"{item['module']:<50} {item['self_seconds']:>8.3f}"
+            f" {item['cumulative_seconds']:>8.3f}"
+        )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Measure import time and first-turn cold start."
+    )
+
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of fresh processes to measure.",
+    )
+    parser.add_argument(
+        "--topic",
+        type=str,
+        default="moral problems",
+        help="Topic selected for the measured session.",
+    )
+    parser.add_argument(
+        "--language-style",
+        type=str,
+        default="quick and casual",
+        help="Language style selected for the measured session.",
+    )
+    parser.add_argument(
+        "--message",
+        type=str,
+        default="I think lying is always wrong, even to protect a friend.",
+        help="First user message of the measured session.",
+    )
+    parser.add_argument(
+        "--corpus-size",
+        type=int,
+        default=200,
+        help="Number of synthetic chunks in the local vector store.",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.0,
+        help="Seconds before the fake models start answering.",
+    )
+    parser.add_argument(
+        "--top-imports",
+        type=int,
+        default=10,
+        help="Number of slowest imports to report.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Optional path to write the report as JSON.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Report to compare against. Exits with 1 on a regression.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown of a phase median.",
+    )
+    parser.add_argument(
+        "--child",
+        action="store_true",
+        help=argparse.SUPPRESS,
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    if args.child:
+        print(json.dumps(measure_startup(args)))
+        return
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\nCold start regressed:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
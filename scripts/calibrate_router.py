@@ -0,0 +1,141 @@
+"""
+This module calibrates the thresholds of the local lexicon router against
+the decisions of the LLM router. The pipeline logs the lexicon score of every
+message the LLM router decided, both fallbacks and shadow checks, to
+router_log_path. This script tries every pair of thresholds that keeps a
+fallback band and reports how many messages each pair answers locally and
+how often those local routes agree with the LLM.
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List
+
+import yaml
+
+
+def load_decisions(file_path: str) -> List[Dict[str, Any]]:
+    """Load the logged LLM router decisions."""
+    with open(file_path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def evaluate_thresholds(
+    decisions: List[Dict[str, Any]],
+    vectorstore_threshold: float,
+    llm_threshold: float,
+) -> Dict[str, Any]:
+    """Measure the local rate and agreement of one pair of thresholds."""
+    # Shadow checks sample local routes, so each decision is weighted by
+    # the number of messages it stands for
+    total, local, agreed = 0.0, 0.0, 0.0
+    for item in decisions:
+        total += item["weight"]
+        if item["score"] >= vectorstore_threshold:
+            decision = "vectorstore"
+        elif item["score"] <= llm_threshold:
+            decision = "llm"
+        else:
+            continue
+        local += item["weight"]
+        agreed += item["weight"] * (decision == item["decision"])
+
+    return {
+        "vectorstore_threshold": vectorstore_threshold,
+        "llm_threshold": llm_threshold,
+        "local_rate": local / total,
+        "local_agreement": agreed / local if local else 1.0,
+    }
+
+
+def calibrate(
+    decisions: List[Dict[str, Any]],
+    min_agreement: float,
+) -> Dict[str, Any]:
+    """Find the thresholds that route the most messages locally."""
+    scores = [item["score"] for item in decisions]
+    candidates = range(min(scores) - 1, max(scores) + 2)
+    # Scores are integers, so at least one score must lie between the
+    # thresholds for unsure messages to still reach the LLM router
+    results = [
+        evaluate_thresholds(decisions, vectorstore_threshold, llm_threshold)
+        for vectorstore_threshold in candidates
+        for llm_threshold in candidates
+        if vectorstore_threshold - llm_threshold >= 2
+    ]
+
+    accepted = [r for r in results if r["local_agreement"] >= min_agreement]
+    best = None
+    if accepted:
+        best = max(
+            accepted,
+            key=lambda r: (r["local_rate"], r["local_agreement"]),
+        )
+    return {"decisions": len(decisions), "best": best, "candidates": results}
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Calibrate the local router thresholds on LLM decisions."
+    )
+
+    parser.add_argument(
+        "--decisions",
+        type=str,
+        default=None,
+        help="Logged LLM router decisions. Defaults to router_log_path.",
+    )
+    parser.add_argument(
+        "--min-agreement",
+        type=float,
+        default=0.95,
+        help="Lowest accepted agreement of local routes with the LLM.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Optional path to write the report as JSON.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    with open("config.yaml", "r", encoding="utf-8") as file:
+        parameters = yaml.safe_load(file)["parameters"]
+    decisions = load_decisions(args.decisions or parameters["router_log_path"])
+
+    report = calibrate(decisions, args.min_agreement)
+    report["current"] = evaluate_thresholds(
+        decisions,
+        parameters["router_vectorstore_threshold"],
+        parameters["router_llm_threshold"],
+    )
+
+    print(f"{report['decisions']} logged LLM decisions\n")
+    print(
+        f"{'':<10} {'vectorstore':>11} {'llm':>5} {'local':>7}"
+        f" {'agreement':>10}"
+    )
+    for name in ("current", "best"):
+        values = report[name]
+        if values is None:
+            print(f"{name:<10} no thresholds reach the agreement target")
+            continue
+        print(
+            f"{name:<10} {values['vectorstore_threshold']:>11}"
+            f" {values['llm_threshold']:>5}"
+            f" {values['local_rate']:>7.0%}"
+            f" {values['local_agreement']:>10.0%}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+This module converts the JSON Lines export of download_collection.py into a
+Parquet dialogue store partitioned by date and class section, and answers
+common aggregate queries over it.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from scripts.feedback_records import normalize_section
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("section", pa.string())]),
+    flavor="hive",
+)
+
+SESSION_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("timestamp", pa.timestamp("s")),
+        ("name", pa.string()),
+        ("message_count", pa.int32()),
+        ("turn_count", pa.int32()),
+        ("context_count", pa.int32()),
+        ("fields", pa.string()),
+        ("date", pa.string()),
+        ("section", pa.string()),
+    ]
+)
+
+MESSAGE_SCHEMA = pa.schema(
+    [
+        ("session_id", pa.string()),
+        ("message_index", pa.int32()),
+        ("turn_index", pa.int32()),
+        ("type", pa.string()),
+        ("message", pa.string()),
+        ("context", pa.string()),
+        ("date", pa.string()),
+        ("section", pa.string()),
+    ]
+)
+
+# Fields kept out of the store entirely or stored in their own columns
+EXCLUDED_FIELDS = {"password", "messages", "id", "timestamp", "name"}
+
+
+def open_input(file_path: str) -> IO[str]:
+    """Open a JSON Lines export, decompressing it if it ends with .gz."""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    return open(file_path, "r", encoding="utf-8")
+
+
+def read_records(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the exported feedback records one at a time."""
+    with open_input(file_path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def convert_record(
+    record: Dict[str, Any],
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Split a feedback record into a session row and message rows."""
+    timestamp = datetime.strptime(record["timestamp"], "%Y-%m-%d %H:%M:%S")
+    partition = {
+        "date": timestamp.strftime("%Y-%m-%d"),
+        "section": normalize_section(record),
+    }
+
+    # The greeting is turn 0 and each user message starts the next turn
+    messages = []
+    turn_index = 0
+    for message_index, message in enumerate(record.get("messages", [])):
+        message_type = message.get("type")
+        if not message_type:
+            # Malformed messages are skipped rather than failing the build
+            continue
+        content = message.get("content") or {}
+        if message_type == "human":
+            turn_index += 1
+
+        messages.append(
+            {
+                "session_id": record["id"],
+                "message_index": message_index,
+                "turn_index": turn_index,
+                "type": message_type,
+                "message": content.get("message"),
+                "context": content.get("context"),
+                **partition,
+            }
+        )
+
+    fields = {k: v for k, v in record.items() if k not in EXCLUDED_FIELDS}
+    session = {
+        "id": record["id"],
+        "timestamp": timestamp,
+        "name": record.get("name"),
+        "message_count": len(messages),
+        "turn_count": turn_index,
+        "context_count": sum(1 for m in messages if m["context"]),
+        "fields": json.dumps(fields, default=str),
+        **partition,
+    }
+    return session, messages
+
+
+def write_batch(
+    path: str,
+    name: str,
+    rows: List[Dict[str, Any]],
+    schema: pa.Schema,
+    basename: str,
+) -> None:
+    """Append a batch of rows to one partitioned table of the store."""
+    if not rows:
+        return
+
+    ds.write_dataset(
+        pa.Table.from_pylist(rows, schema=schema),
+        os.path.join(path, name),
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def build_store(args: argparse.Namespace) -> Dict[str, int]:
+    """Convert the export into the Parquet store in bounded batches."""
+    if args.overwrite and os.path.exists(args.store):
+        shutil.rmtree(args.store)
+
+    run_id = uuid.uuid4().hex[:8]
+    stats = {"sessions": 0, "messages": 0}
+    sessions, messages = [], []
+
+    def flush(batch: int) -> None:
+        basename = f"part-{run_id}-{batch}"
+        write_batch(args.store, "sessions", sessions, SESSION_SCHEMA, basename)
+        write_batch(args.store, "messages", messages, MESSAGE_SCHEMA, basename)
+        sessions.clear()
+        messages.clear()
+
+    batch = 0
+    for record in read_records(args.input):
+        session, session_messages = convert_record(record)
+        sessions.append(session)
+        messages.extend(session_messages)
+        stats["sessions"] += 1
+        stats["messages"] += len(session_messages)
+
+        if len(sessions) >= args.batch_size:
+            flush(batch)
+            batch += 1
+    flush(batch)
+
+    return stats
+
+
+def load_table(
+    store: str,
+    name: str,
+    columns: List[str],
+    section: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> pd.DataFrame:
+    """Scan only the needed columns and partitions of one table."""
+    dataset = ds.dataset(
+        os.path.join(store, name),
+        format="parquet",
+        partitioning=PARTITIONING,
+    )
+
+    expression = None
+    conditions = []
+    if section:
+        section = normalize_section({"class_section": section})
+        conditions.append(pc.field("section") == section)
+    if start_date:
+        conditions.append(pc.field("date") >= start_date)
+    if end_date:
+        conditions.append(pc.field("date") <= end_date)
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+def query_sessions(store: str, filters: Dict[str, Any]) -> pd.DataFrame:
+    """Count sessions per section."""
+    sessions = load_table(store, "sessions", ["id", "section"], **filters)
+    sessions = sessions.drop_duplicates("id")
+    return sessions.groupby("section").size().to_frame("sessions")
+
+
+def query_daily(store: str, filters: Dict[str, Any]) -> pd.DataFrame:
+    """Count sessions per day."""
+    sessions = load_table(store, "sessions", ["id", "date"], **filters)
+    sessions = sessions.drop_duplicates("id")
+    return sessions.groupby("date").size().to_frame("sessions")
+
+
+def query_turns(store: str, filters: Dict[str, Any]) -> pd.DataFrame:
+    """Summarize turns per session for every section."""
+    sessions = load_table(
+        store,
+        "sessions",
+        ["id", "section", "turn_count"],
+        **filters,
+    )
+    sessions = sessions.drop_duplicates("id")
+    return sessions.groupby("section")["turn_count"].agg(
+        ["count", "mean", "median", "max"]
+    )
+
+
+def query_retrieval(store: str, filters: Dict[str, Any]) -> pd.DataFrame:
+    """Share of replies routed to the vector store, per section."""
+    messages = load_table(
+        store,
+        "messages",
+        [
+            "session_id",
+            "message_index",
+            "turn_index",
+            "type",
+            "context",
+            "section",
+        ],
+        **filters,
+    )
+    messages = messages.drop_duplicates(["session_id", "message_index"])
+
+    # Retrieved context is only stored for replies on the vectorstore route
+    replies = messages[(messages["type"] == "ai") & (messages["turn_index"] > 0)]
+    replies = replies.assign(retrieved=replies["context"].notna())
+    rates = replies.groupby("section")["retrieved"].agg(["count", "mean"])
+    return rates.rename(columns={"count": "replies", "mean": "retrieval_rate"})
+
+
+QUERIES = {
+    "sessions": query_sessions,
+    "daily": query_daily,
+    "turns": query_turns,
+    "retrieval": query_retrieval,
+}
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Build and query the Parquet dialogue store."
+    )
+    parser.add_argument(
+        "--store",
+        type=str,
+        default="dialogue_store",
+        help="Directory of the Parquet dialogue store.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Convert an export.")
+    build.add_argument(
+        "--input",
+        type=str,
+        default="feedback.jsonl",
+        help="JSON Lines export written by download_collection.py.",
+    )
+    build.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Number of sessions written per batch.",
+    )
+    build.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Delete the existing store before converting.",
+    )
+
+    query = subparsers.add_parser("query", help="Run an aggregate query.")
+    query.add_argument(
+        "report",
+        choices=sorted(QUERIES),
+        help="Aggregate to compute.",
+    )
+    query.add_argument(
+        "--section",
+        type=str,
+        default=None,
+        help="Only include this class section.",
+    )
+    query.add_argument(
+        "--start-date",
+        type=str,
+        default=None,
+        help="First date to include, as YYYY-MM-DD.",
+    )
+    query.add_argument(
+        "--end-date",
+        type=str,
+        default=None,
+        help="Last date to include, as YYYY-MM-DD.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+
+    if args.command == "build":
+        stats = build_store(args)
+        print(
+            f"Stored {stats['sessions']} sessions with"
+            f" {stats['messages']} messages in {args.store}."
+        )
+        return
+
+    filters = {
+        "section": args.section,
+        "start_date": args.start_date,
+        "end_date": args.end_date,
+    }
+    print(QUERIES[args.report](args.store, filters).to_string())
+
+
+if __name__ == "__main__":
+    main()
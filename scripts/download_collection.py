@@ -3,13 +3,21 @@ This module is used to download the collection from the Firestore database.
 """
 
 import argparse
+import gzip
 import json
-from typing import Any, Dict, List
+import os
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
 
 import firebase_admin
 import toml
 from firebase_admin import credentials, firestore
 
+from scripts.feedback_records import normalize_section
+
+# Field path Firestore uses to order and filter by document ID
+DOCUMENT_ID = "__name__"
+
 
 def load_secrets(file_path: str) -> Dict[str, Any]:
     """Load application secrets from a TOML file."""
@@ -24,54 +32,96 @@ def initialize_firebase(secrets: Dict[str, Any]) -> None:
     firebase_admin.initialize_app(credential)
 
 
-def fetch_feedback(collection_name: str) -> Dict[str, Dict[str, Any]]:
-    """Fetch user feedback from Firestore and process the data."""
-    database = firestore.client().collection(collection_name).stream()
+def load_checkpoint(file_path: str) -> Dict[str, Any]:
+    """Load the export checkpoint, or an empty one if none exists."""
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path, "r") as file:
+        return json.load(file)
+
 
-    feedback = {}
-    for document in database:
-        data = document.to_dict()
-        data["timestamp"] = data["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+def save_checkpoint(checkpoint: Dict[str, Any], file_path: str) -> None:
+    """Atomically save the export checkpoint."""
+    with open(f"{file_path}.tmp", "w") as file:
+        json.dump(checkpoint, file, indent=4)
+    os.replace(f"{file_path}.tmp", file_path)
 
-        messages = data.get("messages", [])
-        processed_messages = [
-            {"content": json.loads(message["content"])} for message in messages
-        ]
-        data["messages"] = processed_messages
 
-        feedback[document.id] = data
+def stream_documents(
+    collection_name: str,
+    page_size: int,
+    start_after: Optional[Tuple[datetime, str]] = None,
+) -> Iterator[firestore.DocumentSnapshot]:
+    """Page through the collection in (timestamp, id) order with cursors."""
+    collection = firestore.client().collection(collection_name)
+    query = collection.order_by("timestamp").order_by(DOCUMENT_ID)
 
-    return feedback
+    # Both keys form the cursor, so documents sharing the last timestamp
+    # are neither skipped nor exported twice
+    cursor = None
+    if start_after:
+        timestamp, document_id = start_after
+        cursor = {
+            "timestamp": timestamp,
+            DOCUMENT_ID: collection.document(document_id),
+        }
 
+    while True:
+        page = query.limit(page_size)
+        if cursor:
+            page = page.start_after(cursor)
 
-def write_feedback_to_file(
-    feedback: Dict[str, Any],
-    file_path: str = "feedback.json",
-) -> None:
-    """Write processed feedback to a JSON file."""
-    with open(file_path, "w") as file:
-        json.dump(feedback, file, indent=4)
+        documents = list(page.stream())
+        yield from documents
+        if len(documents) < page_size:
+            return
+        cursor = documents[-1]
 
 
-def process_users_by_section(
-    feedback: Dict[str, Any],
+def process_document(document: firestore.DocumentSnapshot) -> Dict[str, Any]:
+    """Convert a feedback document into a JSON-serializable record."""
+    data = document.to_dict()
+    data["id"] = document.id
+    data["timestamp"] = data["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+    data["messages"] = [
+        {**message, "content": json.loads(message["content"])}
+        for message in data.get("messages", [])
+    ]
+    return data
+
+
+def write_page(output: IO[bytes], lines: List[str], compressed: bool) -> int:
+    """Append a page of JSON lines and return the new end offset."""
+    data = "".join(lines).encode("utf-8")
+    if compressed:
+        # Each page is a complete gzip member, and concatenated members
+        # form a valid gzip file, so any page boundary is a safe offset
+        data = gzip.compress(data)
+    output.write(data)
+    output.flush()
+    os.fsync(output.fileno())
+    return output.tell()
+
+
+def add_user_to_section(
+    users_by_section: Dict[str, List[str]],
+    record: Dict[str, Any],
     target_password: str,
-) -> Dict[str, List[str]]:
-    """Process feedback to group users by section."""
-    users_by_section = {}
-    for value in feedback.values():
-        if value.get("password") == target_password and "name" in value:
-            section = (
-                value.get("class_section", "NOSECTION")
-                .replace("-", "")
-                .replace(" ", "")
-                .upper()
-            )
-            users_by_section.setdefault(section, []).append(
-                value["name"].title()
-            )
-
-    return users_by_section
+) -> None:
+    """Add the user of one feedback record to its section."""
+    if record.get("password") != target_password or "name" not in record:
+        return
+
+    section = normalize_section(record)
+    users_by_section.setdefault(section, []).append(record["name"].title())
+
+
+def load_users_by_section(file_path: str) -> Dict[str, List[str]]:
+    """Load previously exported users by section, if any."""
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path, "r") as file:
+        return json.load(file)
 
 
 def write_users_by_section_to_file(
@@ -83,6 +133,67 @@ def write_users_by_section_to_file(
         json.dump(users_by_section, file, indent=4)
 
 
+def export_feedback(args: argparse.Namespace) -> Dict[str, int]:
+    """Stream the collection to JSON Lines and group users by section."""
+    continuing = args.resume or args.incremental
+    checkpoint = load_checkpoint(args.checkpoint) if continuing else {}
+
+    start_after = None
+    if checkpoint.get("last_document_id"):
+        start_after = (
+            datetime.fromisoformat(checkpoint["watermark"]),
+            checkpoint["last_document_id"],
+        )
+
+    users_by_section = checkpoint.get("users_by_section")
+    if users_by_section is None and continuing:
+        users_by_section = load_users_by_section(args.users_output)
+    users_by_section = users_by_section or {}
+
+    stats = {"documents": 0, "messages": 0}
+    compressed = args.output.endswith(".gz")
+    with open(args.output, "ab" if continuing else "wb") as output:
+        # Lines written after the last checkpoint are exported again below
+        if "output_offset" in checkpoint:
+            output.truncate(checkpoint["output_offset"])
+
+        page = []
+        for document in stream_documents(
+            args.collection,
+            args.page_size,
+            start_after=start_after,
+        ):
+            # Documents arrive in timestamp order, so the last one is newest
+            timestamp = document.get("timestamp")
+            record = process_document(document)
+            page.append(json.dumps(record) + "\n")
+            add_user_to_section(users_by_section, record, args.password)
+
+            stats["documents"] += 1
+            stats["messages"] += len(record["messages"])
+            checkpoint["last_document_id"] = document.id
+            checkpoint["watermark"] = timestamp.isoformat()
+
+            # Progress is recorded once per page, after the page is on disk
+            if len(page) == args.page_size:
+                checkpoint["output_offset"] = write_page(
+                    output,
+                    page,
+                    compressed,
+                )
+                checkpoint["users_by_section"] = users_by_section
+                save_checkpoint(checkpoint, args.checkpoint)
+                page = []
+
+        if page or "output_offset" not in checkpoint:
+            checkpoint["output_offset"] = write_page(output, page, compressed)
+        checkpoint["users_by_section"] = users_by_section
+        save_checkpoint(checkpoint, args.checkpoint)
+
+    write_users_by_section_to_file(users_by_section, args.users_output)
+    return stats
+
+
 def parse_arguments() -> argparse.Namespace:
     """Parse command line arguments for configurability."""
     parser = argparse.ArgumentParser(
@@ -107,6 +218,40 @@ def parse_arguments() -> argparse.Namespace:
         default="lnhsHumanities",
         help="Target password for processing feedback.",
     )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="feedback.jsonl",
+        help="JSON Lines output, gzip-compressed if it ends with .gz.",
+    )
+    parser.add_argument(
+        "--users-output",
+        type=str,
+        default="users_by_section.json",
+        help="Output path for the users grouped by section.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default="feedback_checkpoint.json",
+        help="Path to the checkpoint of the last exported document.",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=500,
+        help="Number of documents fetched per page.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted export after the last document.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only export documents after the last checkpointed one.",
+    )
 
     return parser.parse_args()
 
@@ -117,12 +262,11 @@ def main() -> None:
     secrets = load_secrets(args.config)
     initialize_firebase(secrets)
 
-    feedback = fetch_feedback(args.collection)
-    write_feedback_to_file(feedback)
-
-    users_by_section = process_users_by_section(feedback, args.password)
-    write_users_by_section_to_file(users_by_section)
-
+    stats = export_feedback(args)
+    print(
+        f"Exported {stats['documents']} documents with"
+        f" {stats['messages']} messages to {args.output}."
+    )
     print("Collection and user processing completed successfully.")
 
 
@@ -0,0 +1,281 @@
+"""
+This module compares the fused turn mode, which produces the statement
+quality, question and answer in one structured call, against the staged
+three-call pipeline on the scripted dialogues. Fake language models are
+used by default, so latency and token counts can be compared offline; with
+--model both modes run against a real OpenAI model, which is what makes the
+quality classification agreement meaningful.
+"""
+
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import yaml
+
+from eidos.chatbot import ChatbotPipeline, ignore_progress
+from eidos.session_history import SessionHistory
+from eidos.timing import StageTimer
+from scripts.benchmark_pipeline import (
+    OfflineDocumentManager,
+    OfflinePipeline,
+    load_configuration,
+    seed_corpus,
+    summarize_latencies,
+)
+
+MODES = ("staged", "fused")
+
+
+def run_mode(
+    pipeline: ChatbotPipeline,
+    mode: str,
+    user_message: str,
+    messages: List[Any],
+    context: str,
+) -> Dict[str, Any]:
+    """Generate one reply in the given mode and measure its cost."""
+    generate = getattr(pipeline, f"get_{mode}_answer")
+    with pipeline.metrics.track_turn() as turn:
+        start = time.perf_counter()
+        quality, answer = generate(
+            user_message,
+            messages,
+            context,
+            StageTimer(),
+            False,
+            ignore_progress,
+        )
+        latency = time.perf_counter() - start
+
+    return {
+        "latency": latency,
+        # Counted from the model callbacks, so stages that were skipped or
+        # answered by the semantic cache add no call
+        "calls": sum(v["llm_calls"] for v in turn.values()),
+        "prompt_tokens": sum(v["prompt_tokens"] for v in turn.values()),
+        "completion_tokens": sum(
+            v["completion_tokens"] for v in turn.values()
+        ),
+        "inconsistent": "inconsistent" in quality,
+        "answer": answer,
+    }
+
+
+def evaluate_dialogue(
+    pipeline: ChatbotPipeline,
+    dialogue: Dict[str, Any],
+) -> List[Dict[str, Dict[str, Any]]]:
+    """Run both modes on every turn of a dialogue with the same inputs."""
+    turns = []
+    history = SessionHistory()
+    history.add_ai_message(pipeline.get_greeting())
+
+    for user_message in dialogue["turns"]:
+        messages = pipeline.fit_history(
+            pipeline.get_messages_from_history(history)
+        )
+        context = pipeline.get_context(
+            user_message,
+            pipeline.get_chain_context(first_turn=len(messages) <= 1),
+            StageTimer(),
+            ignore_progress,
+        )
+        results = {
+            mode: run_mode(pipeline, mode, user_message, messages, context)
+            for mode in MODES
+        }
+        turns.append(results)
+
+        # Both modes continue from the staged reply to keep inputs equal
+        history.add_user_message(user_message)
+        history.add_ai_message(results["staged"]["answer"], context)
+
+    return turns
+
+
+def summarize_mode(turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate the latency, calls and tokens of one mode."""
+    return {
+        "latency": summarize_latencies([turn["latency"] for turn in turns]),
+        "calls_per_turn": float(np.mean([turn["calls"] for turn in turns])),
+        "prompt_tokens_per_turn": float(
+            np.mean([turn["prompt_tokens"] for turn in turns])
+        ),
+        "completion_tokens_per_turn": float(
+            np.mean([turn["completion_tokens"] for turn in turns])
+        ),
+        "answer_words": float(
+            np.mean([len(turn["answer"].split()) for turn in turns])
+        ),
+    }
+
+
+def run_evaluation(args: argparse.Namespace) -> Dict[str, Any]:
+    """Evaluate both modes on every dialogue and compare them."""
+    with open(args.dialogues, "r", encoding="utf-8") as file:
+        dialogues = yaml.safe_load(file)
+
+    llm_options = {
+        "main": {
+            "latency": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+        },
+        "helper": {
+            "latency": args.helper_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+        },
+    }
+
+    turns = []
+    with tempfile.TemporaryDirectory() as index_path:
+        config = load_configuration(args, index_path)
+        if args.model:
+            config.parameters["llm_main"] = args.model
+            config.parameters["llm_helper"] = args.model
+        document_manager = OfflineDocumentManager(config, latency=0.0)
+        seed_corpus(document_manager, args.corpus_size)
+
+        for dialogue in dialogues:
+            selected_config = copy.copy(config)
+            selected_config.select(
+                dialogue["topic"],
+                dialogue["language_style"],
+            )
+            if args.model:
+                pipeline = ChatbotPipeline(selected_config, document_manager)
+            else:
+                pipeline = OfflinePipeline(
+                    selected_config,
+                    document_manager,
+                    llm_options,
+                )
+            turns.extend(evaluate_dialogue(pipeline, dialogue))
+            pipeline.executor.shutdown()
+
+    agreement = np.mean(
+        [
+            turn["staged"]["inconsistent"] == turn["fused"]["inconsistent"]
+            for turn in turns
+        ]
+    )
+    return {
+        "model": args.model or "fake",
+        "turns": len(turns),
+        "classification_agreement": float(agreement),
+        "modes": {
+            mode: summarize_mode([turn[mode] for turn in turns])
+            for mode in MODES
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a side by side comparison of both modes."""
+    print(
+        f"{report['turns']} turns with the {report['model']} model,"
+        f" quality classification agreed on"
+        f" {report['classification_agreement']:.0%} of them\n"
+    )
+    print(
+        f"{'mode':<8} {'p50 s':>8} {'p95 s':>8} {'calls':>6}"
+        f" {'prompt':>8} {'completion':>11} {'words':>6}"
+    )
+    for mode, values in report["modes"].items():
+        print(
+            f"{mode:<8} {values['latency']['p50_seconds']:>8.3f}"
+            f" {values['latency']['p95_seconds']:>8.3f}"
+            f" {values['calls_per_turn']:>6.1f}"
+            f" {values['prompt_tokens_per_turn']:>8.0f}"
+            f" {values['completion_tokens_per_turn']:>11.0f}"
+            f" {values['answer_words']:>6.0f}"
+        )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Compare the fused and staged turn modes."
+    )
+
+    parser.add_argument(
+        "--dialogues",
+        type=str,
+        default="scripts/benchmark_dialogues.yaml",
+        help="Path to the scripted dialogues.",
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=None,
+        help="OpenAI model to evaluate with instead of the fake models.",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.5,
+        help="Seconds before the main model starts answering.",
+    )
+    parser.add_argument(
+        "--helper-latency",
+        type=float,
+        default=0.2,
+        help="Seconds before the helper model starts answering.",
+    )
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=100.0,
+        help="Generation speed of the fake models.",
+    )
+    parser.add_argument(
+        "--completion-tokens",
+        type=int,
+        default=40,
+        help="Number of tokens generated per completion.",
+    )
+    parser.add_argument(
+        "--corpus-size",
+        type=int,
+        default=200,
+        help="Number of synthetic chunks in the local vector store.",
+    )
+    parser.add_argument(
+        "--history-token-budget",
+        type=int,
+        default=None,
+        help="Token budget before old turns are summarized.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Optional path to write the report as JSON.",
+    )
+
+    args = parser.parse_args()
+    if args.model and not os.environ.get("OPENAI_API_KEY"):
+        parser.error("--model needs the OPENAI_API_KEY environment variable.")
+    args.sequential = True
+    return args
+
+
+def main() -> None:
+    args = parse_arguments()
+    report = run_evaluation(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+This module holds helpers for the exported feedback records that are shared
+by the export and analysis scripts, so none of them needs the Firebase SDK
+just to read an export.
+"""
+
+from typing import Any, Dict
+
+
+def normalize_section(record: Dict[str, Any]) -> str:
+    """Return the class section of a record in a canonical form."""
+    return (
+        record.get("class_section", "NOSECTION")
+        .replace("-", "")
+        .replace(" ", "")
+        .upper()
+    )
@@ -0,0 +1,93 @@
+"""
+This module precomputes the first-turn warmup index of every topic, so new
+pipelines load prefetched candidates from disk instead of building them.
+Warmup files are keyed on a hash of the ingestion manifest, so after new
+documents are ingested the old files are ignored until this is rerun or the
+pipelines rebuild them.
+"""
+
+import argparse
+from typing import Any, Dict
+
+from eidos.configuration import (
+    Configuration,
+    EnvironmentSecrets,
+    TomlSecrets,
+)
+from eidos.document_manager import DocumentManager
+from eidos.warmup import (
+    build_warmup_index,
+    get_warmup_path,
+    remove_stale_warmup_files,
+)
+
+
+def precompute_topic(
+    document_manager: DocumentManager,
+    topic: Dict[str, Any],
+) -> None:
+    """Build and save the warmup index of a single topic."""
+    parameters = document_manager.config.parameters
+    seed_statements = topic.get("seed_statements", [])
+    if not seed_statements:
+        print(f"Skipped {topic['title']}: no seed statements.")
+        return
+
+    warmup_index = build_warmup_index(
+        document_manager,
+        seed_statements,
+        parameters["warmup_candidates"],
+    )
+    path = get_warmup_path(parameters, topic)
+    warmup_index.save(path)
+    remove_stale_warmup_files(parameters, topic, path)
+    print(
+        f"Saved {len(warmup_index)} candidates for {topic['title']}"
+        f" from {len(seed_statements)} seed statements to {path}."
+    )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments for configurability."""
+    parser = argparse.ArgumentParser(
+        description="Precompute the first-turn warmup index per topic."
+    )
+
+    parser.add_argument(
+        "--secrets",
+        type=str,
+        default=None,
+        help="Path to a secrets TOML file. Uses the environment if omitted.",
+    )
+    parser.add_argument(
+        "--topic",
+        type=str,
+        default=None,
+        help="Only precompute this topic.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    if args.secrets:
+        secrets = TomlSecrets(args.secrets)
+    else:
+        secrets = EnvironmentSecrets()
+
+    config = Configuration(secrets=secrets)
+    if not config.parameters["warmup_path"]:
+        raise SystemExit("Warmup is disabled: warmup_path is not set.")
+
+    document_manager = DocumentManager(config)
+    topics = config.topics
+    if args.topic:
+        topics = [config.find_option(topics, args.topic)]
+
+    for topic in topics:
+        precompute_topic(document_manager, topic)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 from eidos.configuration import Configuration
 from eidos.document_manager import DocumentManager
+from eidos.ingestion import IngestionPipeline
 
 if __name__ == "__main__":
     config = Configuration()
     doc_manager = DocumentManager(config)
 
-    docs = doc_manager.get_documents()
-    splits = doc_manager.split_documents(docs)
-    print(f"Adding {len(splits)} splits to the vectorstore.")
-
-    id = doc_manager.vectorstore.add_documents(splits)
+    pipeline = IngestionPipeline(doc_manager)
+    stats = pipeline.run()
+    print(
+        f"Upserted {stats['upserted_chunks']} splits from"
+        f" {stats['changed_files']} new or changed files and deleted"
+        f" {stats['deleted_chunks']} stale splits from"
+        f" {stats['removed_files']} removed files."
+    )
@@ -0,0 +1,37 @@
+import os
+import unittest
+from unittest import mock
+
+from langchain_openai import ChatOpenAI
+
+from eidos.chatbot import ChatbotPipeline
+from eidos.configuration import Configuration, EnvironmentSecrets
+
+
+class CreateLLMTest(unittest.TestCase):
+    def setUp(self):
+        self.config = Configuration(secrets=EnvironmentSecrets())
+        self.config.parameters["warmup_path"] = None
+        self.config.select("moral problems", "quick and casual")
+
+    @mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test"})
+    def test_llms_are_chat_openai_models(self):
+        pipeline = ChatbotPipeline(self.config)
+        try:
+            self.assertIsInstance(pipeline.llm_main, ChatOpenAI)
+            self.assertIsInstance(pipeline.llm_helper, ChatOpenAI)
+            self.assertEqual(
+                pipeline.llm_main.model_name,
+                self.config.parameters["llm_main"],
+            )
+            self.assertEqual(
+                pipeline.llm_helper.model_name,
+                self.config.parameters["llm_helper"],
+            )
+            self.assertIs(pipeline.llm_main.cache, pipeline.completion_cache)
+        finally:
+            pipeline.executor.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+
+from langchain_core.documents import Document
+
+from eidos.lexical_index import LexicalIndex
+
+TEXTS = [
+    "Kant holds that lying is always wrong, because the categorical"
+    " imperative forbids treating persons merely as means.",
+    "Many people believe lying is wrong, but they think a small lie can be"
+    " right when it protects a friend.",
+    "Utilitarians believe an action is right when it produces the greatest"
+    " happiness, so lying is wrong only when it causes harm.",
+    "Aristotle describes virtue as a golden mean between two extremes, such"
+    " as courage between cowardice and recklessness.",
+    "People often believe that what is always wrong in one culture may be"
+    " right in another culture.",
+    "Gettier cases show that justified true belief is not sufficient for"
+    " knowledge.",
+]
+
+
+class LexicalIndexSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = LexicalIndex(self.directory.name)
+        self.index.add_documents(
+            [Document(page_content=text) for text in TEXTS],
+            [str(i) for i in range(len(TEXTS))],
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_common_words_give_a_weak_match(self):
+        # Every query term appears in the best chunk, but in others too
+        documents, strength = self.index.search(
+            "I believe lying is always wrong.",
+            k=3,
+        )
+        self.assertEqual(len(documents), 3)
+        self.assertLess(strength, 0.5)
+
+    def test_rare_terms_give_a_strong_match(self):
+        documents, strength = self.index.search("golden mean", k=3)
+        self.assertIn("golden mean", documents[0].page_content)
+        self.assertGreater(strength, 0.5)
+
+    def test_unknown_terms_do_not_weaken_a_match(self):
+        _, strength = self.index.search("Gettier cases", k=3)
+        _, unknown_strength = self.index.search("Gettier zzyzx cases", k=3)
+        self.assertEqual(strength, unknown_strength)
+
+    def test_strength_uses_runner_up_when_k_is_one(self):
+        documents, strength = self.index.search("lying wrong", k=1)
+        self.assertEqual(len(documents), 1)
+        self.assertLess(strength, 0.5)
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("zzyzx", k=3), ([], 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+from eidos.local_vectorstore import LocalVectorStore
+
+
+class HashEmbeddings:
+    # Deterministic random vectors, so equal texts get equal embeddings
+    def embed_query(self, text):
+        generator = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return generator.normal(size=16).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class LocalVectorStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_store(self, **kwargs):
+        return LocalVectorStore(self.path, HashEmbeddings(), **kwargs)
+
+    def add(self, store, count, prefix="text"):
+        texts = [f"{prefix} {i}" for i in range(count)]
+        store.add_texts(texts, ids=[f"{prefix}-{i}" for i in range(count)])
+
+    def rows_on_disk(self, store):
+        return os.path.getsize(store.vectors_path) // (store.dimensions * 4)
+
+    def test_batches_are_appended(self):
+        store = self.open_store()
+        self.add(store, 10)
+        size = os.path.getsize(store.records_path)
+        self.add(store, 5, prefix="more")
+
+        with open(store.records_path, "r", encoding="utf-8") as file:
+            lines = file.readlines()
+        self.assertEqual(len(lines), 15)
+        self.assertGreater(os.path.getsize(store.records_path), size)
+        self.assertEqual(self.rows_on_disk(store), 15)
+
+    def test_replaced_and_deleted_ids_survive_reload(self):
+        store = self.open_store()
+        self.add(store, 10)
+        store.add_texts(["replacement"], ids=["text-3"])
+        store.delete(ids=["text-4", "missing"])
+
+        reopened = self.open_store()
+        records = {r["id"]: r["text"] for r in reopened.records}
+        self.assertEqual(len(records), 9)
+        self.assertEqual(records["text-3"], "replacement")
+        self.assertNotIn("text-4", records)
+
+        result = reopened.similarity_search("replacement", k=1)[0]
+        self.assertEqual(result.page_content, "replacement")
+        results = reopened.similarity_search("text 4", k=10)
+        self.assertNotIn("text 4", [r.page_content for r in results])
+
+    def test_duplicate_ids_in_one_batch_keep_the_last(self):
+        store = self.open_store()
+        store.add_texts(["first", "second"], ids=["same", "same"])
+
+        self.assertEqual(len(store.records), 1)
+        self.assertEqual(store.records[0]["text"], "second")
+        self.assertEqual(self.rows_on_disk(store), 1)
+
+    def test_compaction_drops_dead_rows(self):
+        store = self.open_store()
+        self.add(store, 10)
+        store.delete(ids=[f"text-{i}" for i in range(6)])
+
+        # Dead rows outnumbered live ones, so both files were rewritten
+        self.assertEqual(self.rows_on_disk(store), 4)
+        with open(store.records_path, "r", encoding="utf-8") as file:
+            self.assertEqual(len(file.readlines()), 4)
+        self.assertEqual(len(self.open_store().records), 4)
+
+        store.delete(ids=[r["id"] for r in store.records])
+        self.assertEqual(store.records, [])
+        self.assertFalse(os.path.exists(store.vectors_path))
+        self.assertEqual(store.similarity_search("text 1"), [])
+
+    def test_torn_write_is_dropped_on_load(self):
+        store = self.open_store()
+        self.add(store, 3)
+        with open(store.vectors_path, "ab") as file:
+            np.zeros(store.dimensions, dtype=np.float32).tofile(file)
+        with open(store.records_path, "a", encoding="utf-8") as file:
+            file.write('{"id": "torn", "text"')
+
+        reopened = self.open_store()
+        self.assertEqual(len(reopened.records), 3)
+        self.assertEqual(self.rows_on_disk(reopened), 3)
+
+        reopened.add_texts(["after"], ids=["after"])
+        records = {r["id"] for r in self.open_store().records}
+        self.assertEqual(records, {"text-0", "text-1", "text-2", "after"})
+
+    def test_ivf_search_skips_dead_rows(self):
+        store = self.open_store(search="ivf", n_lists=4, n_probes=4)
+        self.add(store, 40)
+        store.delete(ids=["text-7"])
+
+        results = store.similarity_search("text 7", k=40)
+        self.assertEqual(len(results), 39)
+        self.assertNotIn("text 7", [r.page_content for r in results])
+
+
+if __name__ == "__main__":
+    unittest.main()
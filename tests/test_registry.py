@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from eidos.configuration import Configuration, EnvironmentSecrets
+from eidos.registry import PipelineRegistry
+
+
+class PipelineRegistryTest(unittest.TestCase):
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test"})
+        environment.start()
+        self.addCleanup(environment.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.config = Configuration(secrets=EnvironmentSecrets())
+        self.config.parameters.update(
+            {
+                "vectorstore_backend": "local",
+                "local_index_path": directory.name,
+                "history_token_budget": None,
+                "pipeline_idle_ttl": 60,
+            }
+        )
+        self.config.select("moral problems", "quick and casual")
+        self.registry = PipelineRegistry(self.config.parameters)
+        self.pipelines = []
+
+    def tearDown(self):
+        for pipeline in self.pipelines:
+            pipeline.executor.shutdown()
+
+    def get_pipeline(self):
+        pipeline = self.registry.get_pipeline(self.config)
+        self.pipelines.append(pipeline)
+        return pipeline
+
+    def test_pipeline_is_shared(self):
+        self.assertIs(self.get_pipeline(), self.get_pipeline())
+
+    def test_idle_pipeline_is_evicted(self):
+        pipeline = self.get_pipeline()
+        pipeline.last_used -= 120
+        self.assertIsNot(self.get_pipeline(), pipeline)
+
+    def test_turns_keep_pipeline_registered(self):
+        pipeline = self.get_pipeline()
+        pipeline.last_used -= 120
+        # A turn of an existing session counts as use
+        pipeline.touch()
+        self.assertIs(self.get_pipeline(), pipeline)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.runnables import RunnableLambda
+
+from eidos.response_models import RouteModel
+from eidos.router import LexiconRouter
+
+
+def create_router(**kwargs):
+    options = {
+        "vectorstore_threshold": 2,
+        "llm_threshold": -1,
+        "shadow_rate": 0.0,
+        "executor": None,
+        **kwargs,
+    }
+    return LexiconRouter(
+        ["hume", "kant", "john stuart mill"],
+        ["problem of induction", "virtue", "argument"],
+        **options,
+    )
+
+
+def create_route_chain(decision, calls):
+    def invoke(inputs):
+        calls.append(inputs["user_message"])
+        return RouteModel(explanation="test", decision=decision)
+
+    return RunnableLambda(invoke)
+
+
+class ScoreTest(unittest.TestCase):
+    def setUp(self):
+        self.router = create_router()
+
+    def test_philosophers_count_twice_and_keywords_once(self):
+        score = self.router.score("Kant wrote about virtue and duty")
+        self.assertEqual(score, 3)
+
+    def test_possessive_matches_lexicon_entry(self):
+        message = "Hume's problem of induction is not a justification."
+        self.assertEqual(self.router.score(message), 3)
+        self.assertEqual(
+            self.router.score("Hume’s view of the self was radical"),
+            2,
+        )
+
+    def test_phrases_match_whole_words(self):
+        self.assertEqual(
+            self.router.score("John Stuart Mill cared about happiness"),
+            2,
+        )
+        self.assertEqual(self.router.score("Johnny stuart mills was here"), 0)
+
+    def test_isms_add_one(self):
+        self.assertEqual(
+            self.router.score("Utilitarianism counts every person equally"),
+            1,
+        )
+
+    def test_questions_and_short_messages_are_penalized(self):
+        score = self.router.score("I believe lying is always wrong.")
+        self.assertEqual(score, 0)
+        self.assertEqual(self.router.score("Is that right?"), -2)
+
+
+class DecideTest(unittest.TestCase):
+    def setUp(self):
+        self.router = create_router()
+
+    def test_thresholds_leave_a_fallback_band(self):
+        self.assertEqual(self.router.decide(3), "vectorstore")
+        self.assertEqual(self.router.decide(2), "vectorstore")
+        self.assertIsNone(self.router.decide(1))
+        self.assertIsNone(self.router.decide(0))
+        self.assertEqual(self.router.decide(-1), "llm")
+
+    def test_unsure_messages_fall_back_to_the_llm(self):
+        calls = []
+        router = create_router()
+        chain = router.wrap(create_route_chain("vectorstore", calls))
+
+        route = chain.invoke({"user_message": "Lying is always wrong to me."})
+        self.assertEqual(route.decision, "vectorstore")
+        self.assertEqual(len(calls), 1)
+
+        route = chain.invoke({"user_message": "Kant and Hume disagreed"})
+        self.assertEqual(route.decision, "vectorstore")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(router.get_stats()["local"], 1)
+        self.assertEqual(router.get_stats()["fallback"], 1)
+
+    def test_llm_decisions_are_logged_with_weights(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, "router.jsonl")
+            executor = ThreadPoolExecutor(max_workers=1)
+            router = create_router(
+                shadow_rate=1.0,
+                executor=executor,
+                log_path=log_path,
+            )
+            cached_calls, shadow_calls = [], []
+            chain = router.wrap(
+                create_route_chain("llm", cached_calls),
+                shadow_chain=create_route_chain("vectorstore", shadow_calls),
+            )
+
+            chain.invoke({"user_message": "Lying is always wrong to me."})
+            chain.invoke({"user_message": "Kant and Hume disagreed"})
+            executor.shutdown()
+
+            with open(log_path, "r", encoding="utf-8") as file:
+                entries = [json.loads(line) for line in file]
+
+        # Shadow checks skip the cached chain
+        self.assertEqual(len(cached_calls), 1)
+        self.assertEqual(len(shadow_calls), 1)
+        self.assertCountEqual(
+            entries,
+            [
+                {"score": 0, "decision": "llm", "weight": 1.0},
+                {"score": 3, "decision": "vectorstore", "weight": 1.0},
+            ],
+        )
+        self.assertEqual(router.get_stats()["shadow_agreement"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
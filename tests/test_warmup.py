@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from langchain_core.documents import Document
+
+from eidos.warmup import (
+    WarmupIndex,
+    get_warmup_path,
+    remove_stale_warmup_files,
+)
+
+TOPIC = {"title": "Moral problems"}
+
+
+class WarmupPathTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.parameters = {
+            "warmup_path": os.path.join(self.directory.name, "warmup"),
+            "ingestion_manifest_path": os.path.join(
+                self.directory.name,
+                "manifest.json",
+            ),
+            "embedding_model": "text-embedding-3-small",
+            "embedding_dimensions": 512,
+        }
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_manifest(self, manifest):
+        with open(self.parameters["ingestion_manifest_path"], "w") as file:
+            json.dump(manifest, file)
+
+    def save_index(self, path):
+        index = WarmupIndex([Document(page_content="text")], np.ones((1, 4)))
+        index.save(path)
+
+    def test_path_changes_with_the_corpus(self):
+        unversioned = get_warmup_path(self.parameters, TOPIC)
+        self.write_manifest({"a.txt": {"hash": "1", "ids": ["x"]}})
+        first = get_warmup_path(self.parameters, TOPIC)
+        self.write_manifest({"a.txt": {"hash": "2", "ids": ["y"]}})
+        second = get_warmup_path(self.parameters, TOPIC)
+
+        self.assertEqual(len({unversioned, first, second}), 3)
+        self.assertTrue(os.path.basename(first).startswith("moral_problems-"))
+
+    def test_stale_versions_are_removed(self):
+        self.write_manifest({"a.txt": {"hash": "1", "ids": ["x"]}})
+        stale = get_warmup_path(self.parameters, TOPIC)
+        self.save_index(stale)
+        other_topic = get_warmup_path(self.parameters, {"title": "Art"})
+        self.save_index(other_topic)
+
+        self.write_manifest({"a.txt": {"hash": "2", "ids": ["y"]}})
+        current = get_warmup_path(self.parameters, TOPIC)
+        self.save_index(current)
+        remove_stale_warmup_files(self.parameters, TOPIC, current)
+
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(current))
+        self.assertTrue(os.path.exists(other_topic))
+
+
+if __name__ == "__main__":
+    unittest.main()